@@ -1,12 +1,82 @@
+import fcntl
 import os
 from flask import Flask
 from flask_cors import CORS
-from app.config import CORS_ORIGINS
+from werkzeug.serving import is_running_from_reloader
+from app.config import CORS_ORIGINS, WORKERS_LOCK_PATH
+from app.json_provider import OrjsonProvider
+
+# Open lock file of the process that owns the background workers. Kept
+# referenced for the life of the process so the flock is never released.
+_workers_lock_file = None
+
+
+def _acquire_workers_lock():
+    """
+    Try to become the single process that runs the background workers.
+
+    Uses a non-blocking flock on WORKERS_LOCK_PATH, so across Werkzeug
+    reloads and multi-process servers only the first process to start wins.
+    The lock is released by the OS when the owning process exits.
+    """
+    global _workers_lock_file
+
+    if _workers_lock_file is not None:
+        return True
+
+    WORKERS_LOCK_PATH.parent.mkdir(parents=True, exist_ok=True)
+    lock_file = open(WORKERS_LOCK_PATH, 'w')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        return False
+
+    _workers_lock_file = lock_file
+    return True
+
+
+def _release_inherited_lock():
+    """
+    Drop the lock file a forked child inherits from the worker process.
+
+    A server that imports the app before forking (gunicorn --preload) keeps
+    the workers in the parent. Closing the child's copy leaves the parent
+    holding the flock.
+    """
+    global _workers_lock_file
+
+    if _workers_lock_file is not None:
+        _workers_lock_file.close()
+        _workers_lock_file = None
+
+
+os.register_at_fork(after_in_child=_release_inherited_lock)
+
+
+def start_background_workers(app):
+    """
+    Start the export, training and inference workers if this process owns the lock.
+
+    Other server processes only write jobs to the database; the workers
+    pick up pending jobs and newly saved labels from there.
+    """
+    if not _acquire_workers_lock():
+        return False
+
+    from app.workers.export_worker import start_export_worker
+    from app.workers.training_worker import start_training_worker
+    from app.workers.inference_worker import start_inference_worker
+    start_export_worker(app)
+    start_training_worker(app)
+    start_inference_worker(app)
+    return True
 
 
 def create_app():
     """Flask application factory."""
     app = Flask(__name__)
+    app.json = OrjsonProvider(app)
 
     # Enable CORS for frontend
     CORS(app, origins=CORS_ORIGINS)
@@ -19,13 +89,9 @@ def create_app():
     from app.routes import register_blueprints
     register_blueprints(app)
 
-    # Start background workers (only in main process, not reloader)
-    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true' or not app.debug:
-        from app.workers.export_worker import start_export_worker
-        from app.workers.training_worker import start_training_worker
-        from app.workers.inference_worker import start_inference_worker
-        start_export_worker(app)
-        start_training_worker(app)
-        start_inference_worker(app)
+    # Start background workers. The Werkzeug reloader parent only watches
+    # files, so in debug mode they run in the serving child instead.
+    if not app.debug or is_running_from_reloader():
+        start_background_workers(app)
 
     return app
@@ -1,28 +1,109 @@
 import os
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
 
 # Base directory for the backend
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASE_DIR = Path(__file__).resolve().parent.parent
 
-# Database configuration
-DATABASE_PATH = os.environ.get('DATABASE_PATH', os.path.join(BASE_DIR, 'data', 'geolabel.db'))
 
-# CORS configuration
-CORS_ORIGINS = os.environ.get('CORS_ORIGINS', 'http://localhost:3000').split(',')
+def _env_path(name: str, default: Path) -> Path:
+    """Read a path from the environment, falling back to a default."""
+    value = os.environ.get(name)
+    return Path(value) if value else default
 
-# Google Earth Engine configuration
-GEE_SERVICE_ACCOUNT_PATH = os.environ.get(
-    'GEE_SERVICE_ACCOUNT_PATH',
-    os.path.join(BASE_DIR, 'credentials', 'gee-service-account.json')
-)
 
-# Export configuration
-EXPORTS_DIR = os.environ.get('EXPORTS_DIR', os.path.join(BASE_DIR, 'data', 'exports'))
+@dataclass(frozen=True, slots=True)
+class Settings:
+    """Application settings, parsed once from the environment."""
 
-# Mask configuration (for ML training target masks)
-MASKS_DIR = os.environ.get('MASKS_DIR', os.path.join(BASE_DIR, 'data', 'masks'))
+    # Database configuration
+    database_path: Path
 
-# Models configuration (for ML training checkpoints and logs)
-MODELS_DIR = os.environ.get('MODELS_DIR', os.path.join(BASE_DIR, 'data', 'models'))
+    # CORS configuration
+    cors_origins: tuple[str, ...]
 
-# Inference configuration (for inference job outputs)
-INFERENCE_DIR = os.environ.get('INFERENCE_DIR', os.path.join(BASE_DIR, 'data', 'inference'))
+    # Google Earth Engine configuration
+    gee_service_account_path: Path
+
+    # Export configuration
+    exports_dir: Path
+
+    # Mask configuration (for ML training target masks)
+    masks_dir: Path
+
+    # Models configuration (for ML training checkpoints and logs)
+    models_dir: Path
+
+    # Inference configuration (for inference job outputs)
+    inference_dir: Path
+
+    # Lock file held by the one process that runs the background workers
+    workers_lock_path: Path
+
+    # Concurrent GEE downloads per inference job, and for chip exports
+    # (bounded by GEE quotas)
+    gee_download_workers: int
+
+    # Threads writing masks when regenerating a project's masks
+    mask_workers: int
+
+    # Seconds between the background workers' checks for jobs created by
+    # other server processes
+    worker_poll_interval: float
+
+    @classmethod
+    def from_env(cls) -> 'Settings':
+        """Build settings from environment variables with backend defaults."""
+        data_dir = BASE_DIR / 'data'
+        return cls(
+            database_path=_env_path('DATABASE_PATH', data_dir / 'geolabel.db'),
+            cors_origins=tuple(
+                os.environ.get('CORS_ORIGINS', 'http://localhost:3000').split(',')
+            ),
+            gee_service_account_path=_env_path(
+                'GEE_SERVICE_ACCOUNT_PATH',
+                BASE_DIR / 'credentials' / 'gee-service-account.json'
+            ),
+            exports_dir=_env_path('EXPORTS_DIR', data_dir / 'exports'),
+            masks_dir=_env_path('MASKS_DIR', data_dir / 'masks'),
+            models_dir=_env_path('MODELS_DIR', data_dir / 'models'),
+            inference_dir=_env_path('INFERENCE_DIR', data_dir / 'inference'),
+            workers_lock_path=_env_path('WORKERS_LOCK_PATH', data_dir / '.workers.lock'),
+            gee_download_workers=int(os.environ.get('GEE_DOWNLOAD_WORKERS', '8')),
+            mask_workers=int(os.environ.get('MASK_WORKERS', os.cpu_count() or 1)),
+            worker_poll_interval=float(os.environ.get('WORKER_POLL_INTERVAL', '2')),
+        )
+
+
+settings = Settings.from_env()
+
+# Module-level names kept for existing imports
+DATABASE_PATH = settings.database_path
+CORS_ORIGINS = list(settings.cors_origins)
+GEE_SERVICE_ACCOUNT_PATH = settings.gee_service_account_path
+EXPORTS_DIR = settings.exports_dir
+MASKS_DIR = settings.masks_dir
+MODELS_DIR = settings.models_dir
+INFERENCE_DIR = settings.inference_dir
+WORKERS_LOCK_PATH = settings.workers_lock_path
+GEE_DOWNLOAD_WORKERS = settings.gee_download_workers
+MASK_WORKERS = settings.mask_workers
+WORKER_POLL_INTERVAL = settings.worker_poll_interval
+
+
+@lru_cache(maxsize=1024)
+def project_export_dir(project_id: int) -> Path:
+    """Directory holding a project's exported chip GeoTIFFs."""
+    return EXPORTS_DIR / str(project_id)
+
+
+@lru_cache(maxsize=1024)
+def project_mask_dir(project_id: int) -> Path:
+    """Directory holding a project's training mask GeoTIFFs."""
+    return MASKS_DIR / str(project_id)
+
+
+def mask_cache_dir() -> Path:
+    """Directory holding content-addressed masks shared across projects."""
+    return MASKS_DIR / '_cache'
@@ -1,34 +1,347 @@
+import atexit
 import os
+import queue
 import sqlite3
-from flask import g
-from app.config import DATABASE_PATH
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from flask import g, has_app_context, has_request_context
+from app.config import DATABASE_PATH, project_export_dir, project_mask_dir
+
+
+# Per-connection settings. journal_mode=WAL persists in the database file,
+# so it is set once in init_db() rather than on every connect.
+CONNECTION_PRAGMAS = (
+    'PRAGMA foreign_keys = ON',
+    'PRAGMA synchronous = NORMAL',  # Safe under WAL, avoids fsync per commit
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA cache_size = -65536',  # 64 MB page cache
+    'PRAGMA mmap_size = 268435456',  # 256 MB memory-mapped reads
+    'PRAGMA busy_timeout = 5000',  # Wait on writer locks instead of failing
+    'PRAGMA journal_size_limit = 67108864',  # Truncate the WAL back to 64 MB after checkpoints
+)
+
+# Page size for newly created databases. Larger pages keep typical GeoJSON
+# and config blobs on one page instead of spilling into overflow pages.
+# Only takes effect before the first table is created; existing WAL
+# databases keep their page size.
+PAGE_SIZE = 8192
+
+# Prepared statements kept per connection. Pooled connections live across
+# many requests, so the cache needs room for every distinct query in the app.
+CACHED_STATEMENTS = 256
+
+# Schema version stored in PRAGMA user_version. Bump whenever the DDL in
+# init_db() changes so existing databases pick up the new schema.
+SCHEMA_VERSION = 4
+
+# Tables keyed by client-generated TEXT ids are stored WITHOUT ROWID, so the
+# primary key is the storage key and lookups skip the rowid indirection.
+CHIPS_TABLE = '''
+        CREATE TABLE IF NOT EXISTS {name} (
+            id TEXT PRIMARY KEY,
+            project_id INTEGER NOT NULL,
+            geometry_geojson TEXT NOT NULL,
+            center_lng REAL NOT NULL,
+            center_lat REAL NOT NULL,
+            chip_type TEXT NOT NULL CHECK (chip_type IN ('positive', 'negative')),
+            created_at TEXT NOT NULL,
+            FOREIGN KEY (project_id) REFERENCES projects(id) ON DELETE CASCADE
+        ) WITHOUT ROWID;
+'''
+
+POLYGONS_TABLE = '''
+        CREATE TABLE IF NOT EXISTS {name} (
+            id TEXT PRIMARY KEY,
+            chip_id TEXT NOT NULL,
+            geometry_geojson TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            FOREIGN KEY (chip_id) REFERENCES chips(id) ON DELETE CASCADE
+        ) WITHOUT ROWID;
+'''
+
+# Columns of chip_assets, keyed by the asset name passed to set_chip_asset()
+CHIP_ASSET_COLUMNS = {
+    'mask': 'has_mask',
+    'thumbnail': 'has_thumbnail',
+    'export': 'has_export',
+}
+
+# Minimum seconds between PRAGMA optimize runs at connection teardown
+OPTIMIZE_INTERVAL = 10 * 60
+
+_last_optimize = time.monotonic()
+
+# Long-lived per-thread connections for background workers
+_pool = threading.local()
+_pool_connections = []
+_pool_lock = threading.Lock()
+
+# Idle read-only connections for GET routes. LIFO keeps the most recently
+# used (warmest) connections in play; extras beyond the cap are closed.
+READ_POOL_SIZE = 4
+_read_pool = queue.LifoQueue(maxsize=READ_POOL_SIZE)
+
+# Connection pools inherited from the parent by a forked server process.
+# Kept referenced and never closed: closing the connections in the child
+# could checkpoint or remove the WAL the parent is still using.
+_inherited_pools = []
+
+
+def connect_db(check_same_thread=True):
+    """Open a new database connection with the standard settings applied."""
+    # Ensure data directory exists
+    os.makedirs(os.path.dirname(DATABASE_PATH), exist_ok=True)
+
+    db = sqlite3.connect(
+        DATABASE_PATH,
+        check_same_thread=check_same_thread,
+        cached_statements=CACHED_STATEMENTS,
+    )
+    db.row_factory = sqlite3.Row
+    for pragma in CONNECTION_PRAGMAS:
+        db.execute(pragma)
+    return db
+
+
+def get_worker_db():
+    """
+    Get the persistent database connection for the current thread.
+
+    Background workers live outside the request lifecycle, so they keep one
+    connection per thread instead of reconnecting for every job or callback.
+    """
+    db = getattr(_pool, 'conn', None)
+    if db is None:
+        # Closed from the atexit hook, which runs on the main thread
+        db = connect_db(check_same_thread=False)
+        _pool.conn = db
+        with _pool_lock:
+            _pool_connections.append(db)
+    return db
+
+
+@atexit.register
+def _close_worker_dbs():
+    """Close all per-thread worker connections on interpreter exit."""
+    with _pool_lock:
+        while _pool_connections:
+            _pool_connections.pop().close()
+
+
+def _reset_after_fork():
+    """
+    Give a forked child process empty connection pools.
+
+    The pools are replaced rather than drained, since a lock held by another
+    parent thread at fork time would never be released in the child.
+    """
+    global _pool, _pool_connections, _pool_lock, _read_pool
+
+    _inherited_pools.append((_pool_connections, _read_pool))
+    _pool = threading.local()
+    _pool_connections = []
+    _pool_lock = threading.Lock()
+    _read_pool = queue.LifoQueue(maxsize=READ_POOL_SIZE)
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _connect_read_only():
+    """Open a read-only connection for the read pool."""
+    # Shared between request threads, one request at a time
+    db = sqlite3.connect(
+        f'file:{DATABASE_PATH}?mode=ro',
+        uri=True,
+        check_same_thread=False,
+        cached_statements=CACHED_STATEMENTS,
+    )
+    db.row_factory = sqlite3.Row
+    for pragma in CONNECTION_PRAGMAS:
+        db.execute(pragma)
+    return db
+
+
+def get_read_db():
+    """
+    Get a pooled read-only connection for the current request.
+
+    GET routes borrow a mode=ro connection from the read pool instead of
+    opening and configuring a new one per request. WAL lets these readers
+    run alongside the writer. The connection goes back to the pool at
+    teardown. Outside an app context this falls back to get_worker_db().
+    """
+    if not has_app_context():
+        return get_worker_db()
+    if 'read_db' not in g:
+        try:
+            g.read_db = _read_pool.get_nowait()
+        except queue.Empty:
+            g.read_db = _connect_read_only()
+    return g.read_db
+
+
+def release_read_db(e=None):
+    """Return the request's read connection to the pool at teardown."""
+    db = g.pop('read_db', None)
+    if db is None:
+        return
+    if db.in_transaction:
+        db.rollback()
+    try:
+        _read_pool.put_nowait(db)
+    except queue.Full:
+        db.close()
+
+
+@atexit.register
+def _close_read_dbs():
+    """Close pooled read connections on interpreter exit."""
+    while True:
+        try:
+            _read_pool.get_nowait().close()
+        except queue.Empty:
+            break
 
 
 def get_db():
-    """Get database connection for current request."""
-    if 'db' not in g:
-        # Ensure data directory exists
-        os.makedirs(os.path.dirname(DATABASE_PATH), exist_ok=True)
+    """Get database connection for current request.
 
-        g.db = sqlite3.connect(DATABASE_PATH)
-        g.db.row_factory = sqlite3.Row
-        # Enable foreign key support
-        g.db.execute('PRAGMA foreign_keys = ON')
+    Outside a request (e.g. in worker threads, which run jobs inside a bare
+    app context) this falls back to the per-thread worker connection rather
+    than opening one per app context.
+    """
+    if not has_request_context():
+        return get_worker_db()
+    if 'db' not in g:
+        g.db = connect_db()
     return g.db
 
 
+@contextmanager
+def transaction(db):
+    """
+    Run a block of writes in a single BEGIN IMMEDIATE ... COMMIT transaction.
+
+    Taking the write lock up front avoids lock upgrades mid-batch, and the
+    whole batch costs one commit instead of one per statement. Rolls back
+    if the block raises.
+    """
+    db.execute('BEGIN IMMEDIATE')
+    try:
+        yield db
+    except BaseException:
+        db.rollback()
+        raise
+    db.commit()
+
+
+def set_chip_asset(db, chip_id, asset, present=True, updated_at=None):
+    """
+    Record whether a chip's mask, thumbnail or export file exists on disk.
+
+    Lets routes answer existence checks with an index lookup instead of a
+    filesystem stat. Callers updating many chips can pass one updated_at
+    timestamp for the batch. The caller commits.
+    """
+    column = CHIP_ASSET_COLUMNS[asset]
+    db.execute(
+        f'''INSERT INTO chip_assets (chip_id, {column}, updated_at)
+            VALUES (?, ?, ?)
+            ON CONFLICT (chip_id) DO UPDATE SET
+                {column} = excluded.{column},
+                updated_at = excluded.updated_at''',
+        (chip_id, int(present), updated_at or datetime.utcnow().isoformat() + 'Z')
+    )
+
+
 def close_db(e=None):
     """Close database connection at end of request."""
+    global _last_optimize
+
     db = g.pop('db', None)
     if db is not None:
+        # Periodically refresh planner statistics as data grows
+        now = time.monotonic()
+        if now - _last_optimize >= OPTIMIZE_INTERVAL:
+            _last_optimize = now
+            db.execute('PRAGMA optimize')
         db.close()
 
 
+def _migrate_to_without_rowid(db):
+    """Rebuild chips/polygons tables created before they were WITHOUT ROWID."""
+    rows = db.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'table' AND name IN ('chips', 'polygons')"
+    ).fetchall()
+    stale = {row['name'] for row in rows if 'WITHOUT ROWID' not in row['sql'].upper()}
+    if not stale:
+        return
+
+    # Dropping chips would cascade-delete polygons, so foreign keys are
+    # disabled for the rebuild. This PRAGMA is a no-op inside a transaction.
+    db.execute('PRAGMA foreign_keys = OFF')
+    try:
+        script = ['BEGIN IMMEDIATE;']
+        for name, table_sql in (('chips', CHIPS_TABLE), ('polygons', POLYGONS_TABLE)):
+            if name in stale:
+                script.append(f'''
+                    {table_sql.format(name=f'{name}_new')}
+                    INSERT INTO {name}_new SELECT * FROM {name};
+                    DROP TABLE {name};
+                    ALTER TABLE {name}_new RENAME TO {name};
+                ''')
+        script.append('COMMIT;')
+        db.executescript('\n'.join(script))
+    finally:
+        db.execute('PRAGMA foreign_keys = ON')
+
+
+def _backfill_chip_assets(db):
+    """Populate chip_assets from files already on disk for existing chips."""
+    now = datetime.utcnow().isoformat() + 'Z'
+    rows = []
+    for chip in db.execute('SELECT id, project_id FROM chips').fetchall():
+        export_dir = project_export_dir(chip['project_id'])
+        rows.append((
+            chip['id'],
+            int((project_mask_dir(chip['project_id']) / f"{chip['id']}.tif").exists()),
+            int((export_dir / 'thumbnails' / f"{chip['id']}.png").exists()),
+            int((export_dir / f"{chip['id']}.tif").exists()),
+            now,
+        ))
+    db.executemany(
+        '''INSERT OR IGNORE INTO chip_assets (chip_id, has_mask, has_thumbnail, has_export, updated_at)
+           VALUES (?, ?, ?, ?, ?)''',
+        rows
+    )
+    db.commit()
+
+
 def init_db():
     """Initialize database with schema."""
     db = get_db()
 
-    db.executescript('''
+    # A brand-new database file has no pages yet, so the page size can
+    # still be chosen. Must happen before WAL mode writes the header.
+    if db.execute('PRAGMA page_count').fetchone()[0] == 0:
+        db.execute(f'PRAGMA page_size = {PAGE_SIZE}')
+
+    # WAL lets API reads proceed while background workers write
+    db.execute('PRAGMA journal_mode = WAL')
+
+    # Skip DDL entirely when the schema is already current
+    user_version = db.execute('PRAGMA user_version').fetchone()[0]
+    if user_version == SCHEMA_VERSION:
+        return
+
+    _migrate_to_without_rowid(db)
+
+    db.executescript(f'''
+        BEGIN IMMEDIATE;
+
         -- Projects table
         CREATE TABLE IF NOT EXISTS projects (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -39,25 +352,10 @@ def init_db():
         );
 
         -- Chips table (both positive and negative)
-        CREATE TABLE IF NOT EXISTS chips (
-            id TEXT PRIMARY KEY,
-            project_id INTEGER NOT NULL,
-            geometry_geojson TEXT NOT NULL,
-            center_lng REAL NOT NULL,
-            center_lat REAL NOT NULL,
-            chip_type TEXT NOT NULL CHECK (chip_type IN ('positive', 'negative')),
-            created_at TEXT NOT NULL,
-            FOREIGN KEY (project_id) REFERENCES projects(id) ON DELETE CASCADE
-        );
+        {CHIPS_TABLE.format(name='chips')}
 
         -- Polygons table (user-drawn features within positive chips)
-        CREATE TABLE IF NOT EXISTS polygons (
-            id TEXT PRIMARY KEY,
-            chip_id TEXT NOT NULL,
-            geometry_geojson TEXT NOT NULL,
-            created_at TEXT NOT NULL,
-            FOREIGN KEY (chip_id) REFERENCES chips(id) ON DELETE CASCADE
-        );
+        {POLYGONS_TABLE.format(name='polygons')}
 
         -- Export jobs table (tracks export requests)
         CREATE TABLE IF NOT EXISTS export_jobs (
@@ -132,25 +430,63 @@ def init_db():
             FOREIGN KEY (training_job_id) REFERENCES training_jobs(id) ON DELETE SET NULL
         );
 
+        -- Chip assets table (which generated files exist for each chip).
+        -- Not tied to chips by a foreign key: files outlive the chip rows,
+        -- which save_labels deletes and re-inserts on every save.
+        CREATE TABLE IF NOT EXISTS chip_assets (
+            chip_id TEXT PRIMARY KEY,
+            has_mask INTEGER NOT NULL DEFAULT 0,
+            has_thumbnail INTEGER NOT NULL DEFAULT 0,
+            has_export INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT
+        ) WITHOUT ROWID;
+
         -- Indexes for efficient lookups
-        CREATE INDEX IF NOT EXISTS idx_chips_project_id ON chips(project_id);
         CREATE INDEX IF NOT EXISTS idx_polygons_chip_id ON polygons(chip_id);
-        CREATE INDEX IF NOT EXISTS idx_export_jobs_project_id ON export_jobs(project_id);
         CREATE INDEX IF NOT EXISTS idx_export_jobs_status ON export_jobs(status);
-        CREATE INDEX IF NOT EXISTS idx_chip_exports_job_id ON chip_exports(job_id);
         CREATE INDEX IF NOT EXISTS idx_chip_exports_chip_id ON chip_exports(chip_id);
-        CREATE INDEX IF NOT EXISTS idx_training_jobs_project_id ON training_jobs(project_id);
         CREATE INDEX IF NOT EXISTS idx_training_jobs_status ON training_jobs(status);
-        CREATE INDEX IF NOT EXISTS idx_inference_jobs_project_id ON inference_jobs(project_id);
         CREATE INDEX IF NOT EXISTS idx_inference_jobs_status ON inference_jobs(status);
+
+        -- Composite indexes matching (filter, filter) query predicates.
+        -- These cover the leading-column lookups of the indexes dropped below.
+        CREATE INDEX IF NOT EXISTS idx_chips_project_type ON chips(project_id, chip_type);
+        CREATE INDEX IF NOT EXISTS idx_chip_exports_job_status ON chip_exports(job_id, status);
+        CREATE INDEX IF NOT EXISTS idx_export_jobs_project_status ON export_jobs(project_id, status);
+        CREATE INDEX IF NOT EXISTS idx_inference_jobs_training_job ON inference_jobs(training_job_id);
+
+        -- Job list/latest queries: seek by project and read already in
+        -- created_at or completed_at order instead of scanning and sorting.
+        CREATE INDEX IF NOT EXISTS idx_training_jobs_project_created ON training_jobs(project_id, created_at);
+        CREATE INDEX IF NOT EXISTS idx_training_jobs_project_status_completed
+            ON training_jobs(project_id, status, completed_at);
+        CREATE INDEX IF NOT EXISTS idx_inference_jobs_project_created ON inference_jobs(project_id, created_at);
+        CREATE INDEX IF NOT EXISTS idx_inference_jobs_project_status_completed
+            ON inference_jobs(project_id, status, completed_at);
+
+        DROP INDEX IF EXISTS idx_chips_project_id;
+        DROP INDEX IF EXISTS idx_chip_exports_job_id;
+        DROP INDEX IF EXISTS idx_export_jobs_project_id;
+        DROP INDEX IF EXISTS idx_training_jobs_project_id;
+        DROP INDEX IF EXISTS idx_inference_jobs_project_id;
+
+        PRAGMA user_version = {SCHEMA_VERSION};
+        COMMIT;
     ''')
 
-    db.commit()
+    # chip_assets first appeared in schema version 3
+    if user_version < 3:
+        _backfill_chip_assets(db)
+
+    # Populate sqlite_stat1 so the planner picks the indexes above
+    db.execute('ANALYZE')
+    db.execute('PRAGMA optimize')
 
 
 def init_app(app):
     """Register database functions with Flask app."""
     app.teardown_appcontext(close_db)
+    app.teardown_appcontext(release_read_db)
 
     with app.app_context():
         init_db()
@@ -0,0 +1,36 @@
+"""
+Flask JSON provider backed by orjson.
+"""
+from typing import Any
+
+import orjson
+from flask import Response
+from flask.json.provider import JSONProvider
+
+
+class OrjsonProvider(JSONProvider):
+    """
+    Serialize responses and parse request bodies with orjson.
+
+    Output matches Flask's default compact jsonify format: sorted keys, no
+    whitespace and a trailing newline. Non-ASCII text is written as UTF-8
+    rather than \\u escapes, and NaN/Infinity become null.
+    """
+
+    option = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        """Serialize obj to a JSON string."""
+        return orjson.dumps(obj, option=self.option).decode()
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        """Parse a JSON string or bytes."""
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        """Build a JSON response, writing orjson's bytes straight to the body."""
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, option=self.option | orjson.OPT_APPEND_NEWLINE),
+            mimetype='application/json',
+        )
@@ -1,8 +1,17 @@
-"""Machine learning module for GeoLabel training pipeline."""
+"""Machine learning module for GeoLabel training pipeline.
 
-from app.ml.dataset import GeoLabelImageDataset, GeoLabelMaskDataset
-from app.ml.datamodule import GeoLabelDataModule
-from app.ml.trainer import run_training
+Submodules pull in torch, lightning and torchgeo, so they are imported
+lazily on first attribute access rather than when the package loads.
+"""
+
+import importlib
+
+_LAZY_ATTRS = {
+    'GeoLabelImageDataset': 'app.ml.dataset',
+    'GeoLabelMaskDataset': 'app.ml.dataset',
+    'GeoLabelDataModule': 'app.ml.datamodule',
+    'run_training': 'app.ml.trainer',
+}
 
 __all__ = [
     'GeoLabelImageDataset',
@@ -10,3 +19,9 @@ __all__ = [
     'GeoLabelDataModule',
     'run_training',
 ]
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRS:
+        return getattr(importlib.import_module(_LAZY_ATTRS[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
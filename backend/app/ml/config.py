@@ -0,0 +1,32 @@
+"""Training configuration for GeoLabel semantic segmentation.
+
+Kept free of torch/lightning imports so API routes can read it without
+loading the ML stack.
+"""
+
+from dataclasses import asdict, dataclass
+from typing import Any
+
+
+@dataclass(frozen=True, slots=True)
+class TrainingConfig:
+    """Fixed, immutable training configuration."""
+
+    model: str = "unet"
+    backbone: str = "resnet50"
+    weights: bool = True
+    in_channels: int = 10  # Sentinel-2 bands
+    task: str = "binary"
+    lr: float = 1e-4
+    loss: str = "bce"
+    max_epochs: int = 50
+    batch_size: int = 8
+    early_stopping_patience: int = 10
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the configuration as a plain dict for JSON serialization."""
+        return asdict(self)
+
+
+# Fixed training configuration, built once at import
+TRAINING_CONFIG = TrainingConfig()
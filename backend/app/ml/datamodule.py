@@ -1,19 +1,52 @@
 """PyTorch Lightning DataModule for GeoLabel training."""
 
-import os
-import random
+from collections.abc import Sequence
 from typing import Any
 
+import numpy as np
 import torch
 from lightning import LightningDataModule
-from torch.utils.data import DataLoader
-from torchgeo.datasets import stack_samples
+from torch.utils.data import DataLoader, get_worker_info
 from torchgeo.samplers import RandomGeoSampler, GridGeoSampler
 
-from app.config import EXPORTS_DIR, MASKS_DIR
+from app.config import project_export_dir, project_mask_dir
 from app.ml.dataset import GeoLabelImageDataset, GeoLabelMaskDataset, get_chip_ids_with_masks
 
 
+def stack_samples(samples: Sequence[dict[str, Any]]) -> dict[str, Any]:
+    """Collate samples into a batch, stacking tensors into preallocated buffers.
+
+    Drop-in replacement for torchgeo's ``stack_samples``. Inside a DataLoader
+    worker each batch tensor is allocated directly in shared memory, as
+    PyTorch's default_collate does, so handing the batch to the main process
+    does not copy it again. Non-tensor values (bounds, crs) stay as lists.
+
+    Args:
+        samples: Samples returned by the dataset
+
+    Returns:
+        Dict mapping each sample key to a stacked tensor or list of values
+    """
+    in_worker = get_worker_info() is not None
+    batch: dict[str, Any] = {}
+    for key in samples[0]:
+        values = [sample[key] for sample in samples]
+        first = values[0]
+        if not isinstance(first, torch.Tensor):
+            batch[key] = values
+            continue
+
+        if in_worker:
+            storage = first._typed_storage()._new_shared(
+                first.numel() * len(values), device=first.device
+            )
+            out = first.new(storage).resize_(len(values), *first.shape)
+        else:
+            out = first.new_empty((len(values), *first.shape))
+        batch[key] = torch.stack(values, out=out)
+    return batch
+
+
 class GeoLabelDataModule(LightningDataModule):
     """DataModule for training on GeoLabel exported chips and masks."""
 
@@ -53,11 +86,8 @@ class GeoLabelDataModule(LightningDataModule):
             stage: Stage ('fit', 'validate', 'test', 'predict')
         """
         # Get chips that have both imagery and masks
-        chip_ids = get_chip_ids_with_masks(
-            self.project_id,
-            EXPORTS_DIR,
-            MASKS_DIR
-        )
+        # Sorted first so the seeded shuffle below is reproducible
+        chip_ids = np.asarray(sorted(get_chip_ids_with_masks(self.project_id)), dtype=object)
 
         if len(chip_ids) == 0:
             raise ValueError(
@@ -65,8 +95,9 @@ class GeoLabelDataModule(LightningDataModule):
                 "Make sure to export imagery and save labels first."
             )
 
-        # Shuffle and split
-        random.shuffle(chip_ids)
+        # Shuffle and split, seeded per project so runs are reproducible
+        rng = np.random.default_rng(self.project_id)
+        rng.shuffle(chip_ids)
         split_idx = int(len(chip_ids) * (1 - self.val_split))
 
         if split_idx == 0:
@@ -76,23 +107,22 @@ class GeoLabelDataModule(LightningDataModule):
         val_chip_ids = chip_ids[split_idx:] if split_idx < len(chip_ids) else chip_ids[:1]
 
         # Create paths for train and val
-        export_path = os.path.join(EXPORTS_DIR, str(self.project_id))
-        mask_path = os.path.join(MASKS_DIR, str(self.project_id))
+        export_path = str(project_export_dir(self.project_id))
+        mask_path = str(project_mask_dir(self.project_id))
 
         # For TorchGeo, we need to create intersection datasets
         # Since our chips are individual files, we'll load them all and let
         # the sampler handle the spatial queries
 
-        # Create image and mask datasets
-        train_image_ds = GeoLabelImageDataset(export_path)
-        train_mask_ds = GeoLabelMaskDataset(mask_path)
+        # Build the image and mask datasets once; each construction opens every
+        # GeoTIFF and builds an rtree index. The samplers below decide which
+        # patches each split draws, so train and val share the same dataset.
+        image_ds = GeoLabelImageDataset(export_path)
+        mask_ds = GeoLabelMaskDataset(mask_path)
 
-        val_image_ds = GeoLabelImageDataset(export_path)
-        val_mask_ds = GeoLabelMaskDataset(mask_path)
-
-        # Create intersection datasets
-        self.train_dataset = train_image_ds & train_mask_ds
-        self.val_dataset = val_image_ds & val_mask_ds
+        combined = image_ds & mask_ds
+        self.train_dataset = combined
+        self.val_dataset = combined
 
         # Create samplers
         # Use RandomGeoSampler for training, GridGeoSampler for validation
@@ -108,22 +138,34 @@ class GeoLabelDataModule(LightningDataModule):
             stride=self.patch_size,  # Non-overlapping for validation
         )
 
+    def _loader_kwargs(self) -> dict[str, Any]:
+        """DataLoader options shared by the train and val loaders.
+
+        Workers only read GeoTIFFs through torchgeo and never touch SQLite,
+        so multi-process loading is safe here.
+        """
+        use_workers = self.num_workers > 0
+        return {
+            "batch_size": self.batch_size,
+            "num_workers": self.num_workers,
+            "persistent_workers": use_workers,
+            "pin_memory": torch.cuda.is_available(),
+            "prefetch_factor": 4 if use_workers else None,
+            "collate_fn": stack_samples,
+        }
+
     def train_dataloader(self) -> DataLoader:
         """Create training DataLoader."""
         return DataLoader(
             self.train_dataset,
-            batch_size=self.batch_size,
             sampler=self.train_sampler,
-            num_workers=self.num_workers,
-            collate_fn=stack_samples,
+            **self._loader_kwargs(),
         )
 
     def val_dataloader(self) -> DataLoader:
         """Create validation DataLoader."""
         return DataLoader(
             self.val_dataset,
-            batch_size=self.batch_size,
             sampler=self.val_sampler,
-            num_workers=self.num_workers,
-            collate_fn=stack_samples,
+            **self._loader_kwargs(),
         )
@@ -1,13 +1,107 @@
 """Custom TorchGeo datasets for GeoLabel imagery and masks."""
 
 import os
+import pickle
+import zlib
+from functools import lru_cache
 from typing import Any
 
 import torch
+import torchgeo
 from torchgeo.datasets import RasterDataset
 
+from app.config import project_export_dir, project_mask_dir
 
-class GeoLabelImageDataset(RasterDataset):
+
+# Attributes set straight from the constructor arguments; everything else
+# RasterDataset.__init__ leaves on the instance is cached
+_ARG_ATTRS = ("paths", "transforms")
+
+
+def _directory_signature(path: str) -> tuple[int, int, int]:
+    """Summarize a directory's GeoTIFFs as (count, newest mtime, names CRC).
+
+    Only stats the files, so it is far cheaper than opening each one. The
+    directory's own mtime is left out because writing the cache changes it.
+    """
+    names = []
+    newest_mtime_ns = 0
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.name.endswith(".tif"):
+                names.append(entry.name)
+                newest_mtime_ns = max(newest_mtime_ns, entry.stat().st_mtime_ns)
+    names.sort()
+    return len(names), newest_mtime_ns, zlib.crc32("\n".join(names).encode())
+
+
+class CachedIndexRasterDataset(RasterDataset):
+    """RasterDataset that persists its spatial index next to the GeoTIFFs.
+
+    Building the index opens every file with rasterio. When ``paths`` is a
+    single directory, the result is pickled to ``index_cache_name`` and
+    reused while the directory's file count and mtimes are unchanged.
+    """
+
+    index_cache_name = ".index_cache.pkl"
+
+    def __init__(
+        self,
+        paths: str | list[str],
+        crs: Any | None = None,
+        res: float | None = None,
+        transforms: Any | None = None,
+    ) -> None:
+        """Initialize the dataset, loading the cached index when it is current.
+
+        Args:
+            paths: Path(s) to directory containing GeoTIFF files
+            crs: Coordinate reference system to use
+            res: Resolution in units of CRS
+            transforms: Transforms to apply to samples
+        """
+        if not isinstance(paths, str) or not os.path.isdir(paths):
+            super().__init__(paths, crs=crs, res=res, transforms=transforms)
+            return
+
+        cache_path = os.path.join(paths, self.index_cache_name)
+        signature = (
+            type(self).__name__,
+            torchgeo.__version__,
+            str(crs),
+            res,
+            _directory_signature(paths),
+        )
+
+        try:
+            with open(cache_path, "rb") as f:
+                cached = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            cached = None
+
+        if cached is not None and cached["signature"] == signature:
+            # Restore the whole instance state so a warm start matches a
+            # cold one whatever RasterDataset.__init__ sets
+            self.__dict__.update(cached["state"])
+            self.paths = paths
+            self.transforms = transforms
+            return
+
+        super().__init__(paths, crs=crs, res=res, transforms=transforms)
+
+        state = {k: v for k, v in self.__dict__.items() if k not in _ARG_ATTRS}
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                pickle.dump({"signature": signature, "state": state}, f)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            # Unpicklable state just means no cache
+            os.remove(tmp_path)
+            return
+        os.replace(tmp_path, cache_path)
+
+
+class GeoLabelImageDataset(CachedIndexRasterDataset):
     """Dataset for GeoLabel exported Sentinel-2 imagery.
 
     Expects 10-band GeoTIFFs in EXPORTS_DIR/{project_id}/{chip_id}.tif
@@ -35,7 +129,7 @@ class GeoLabelImageDataset(RasterDataset):
         super().__init__(paths, crs=crs, res=res, transforms=transforms)
 
 
-class GeoLabelMaskDataset(RasterDataset):
+class GeoLabelMaskDataset(CachedIndexRasterDataset):
     """Dataset for GeoLabel binary segmentation masks.
 
     Expects single-band GeoTIFFs in MASKS_DIR/{project_id}/{chip_id}.tif
@@ -64,34 +158,50 @@ class GeoLabelMaskDataset(RasterDataset):
         super().__init__(paths, crs=crs, res=res, transforms=transforms)
 
 
-def get_chip_ids_with_masks(project_id: int, exports_dir: str, masks_dir: str) -> list[str]:
+def _list_chip_ids(path: str) -> frozenset[str]:
+    """List chip IDs (``.tif`` file stems) in a directory."""
+    with os.scandir(path) as entries:
+        return frozenset(
+            entry.name[:-4]
+            for entry in entries
+            if entry.name.endswith('.tif')
+        )
+
+
+@lru_cache(maxsize=32)
+def _cached_chip_ids_with_masks(
+    export_path: str,
+    mask_path: str,
+    export_mtime_ns: int,
+    mask_mtime_ns: int,
+) -> tuple[str, ...]:
+    """Intersect chip listings, cached on both directories' mtimes.
+
+    Adding or removing a file updates the directory mtime, so a changed
+    listing produces a new cache key and forces a rescan.
+    """
+    return tuple(_list_chip_ids(export_path) & _list_chip_ids(mask_path))
+
+
+def get_chip_ids_with_masks(project_id: int) -> list[str]:
     """Get list of chip IDs that have both imagery and masks.
 
     Args:
         project_id: Project ID
-        exports_dir: Base exports directory
-        masks_dir: Base masks directory
 
     Returns:
         List of chip IDs that have both imagery and mask files
     """
-    export_path = os.path.join(exports_dir, str(project_id))
-    mask_path = os.path.join(masks_dir, str(project_id))
+    export_path = str(project_export_dir(project_id))
+    mask_path = str(project_mask_dir(project_id))
 
-    if not os.path.exists(export_path) or not os.path.exists(mask_path):
+    try:
+        export_mtime_ns = os.stat(export_path).st_mtime_ns
+        mask_mtime_ns = os.stat(mask_path).st_mtime_ns
+    except FileNotFoundError:
         return []
 
-    export_chips = {
-        os.path.splitext(f)[0]
-        for f in os.listdir(export_path)
-        if f.endswith('.tif')
-    }
-
-    mask_chips = {
-        os.path.splitext(f)[0]
-        for f in os.listdir(mask_path)
-        if f.endswith('.tif')
-    }
-
     # Return chips that have both imagery and masks
-    return list(export_chips & mask_chips)
+    return list(_cached_chip_ids_with_masks(
+        export_path, mask_path, export_mtime_ns, mask_mtime_ns
+    ))
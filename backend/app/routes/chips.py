@@ -1,11 +1,11 @@
 """
 API routes for chip-related operations.
 """
-from flask import Blueprint, jsonify, Response
+from flask import Blueprint, jsonify, Response, send_file
 
-from app.database import get_db
-from app.services.imagery_service import get_chip_thumbnail, get_chip_metadata
-from app.services.mask_service import get_mask_png, get_chip_mask_path
+from app.database import get_read_db
+from app.services.imagery_service import get_chip_thumbnail_path, get_chip_metadata
+from app.services.mask_service import get_mask_png
 
 
 chips_bp = Blueprint('chips', __name__)
@@ -16,10 +16,10 @@ def get_chip_thumbnail_route(chip_id):
     """
     Get RGB thumbnail PNG for an exported chip.
 
-    Returns the thumbnail image directly as PNG bytes.
-    Returns 404 if chip doesn't exist or hasn't been exported.
+    Serves the cached thumbnail PNG with ETag/Last-Modified so repeat
+    requests get 304s. Returns 404 if chip doesn't exist or hasn't been exported.
     """
-    db = get_db()
+    db = get_read_db()
 
     # Get chip and its project from database
     chip = db.execute(
@@ -30,16 +30,16 @@ def get_chip_thumbnail_route(chip_id):
     if not chip:
         return jsonify({'error': 'Chip not found'}), 404
 
-    # Try to get thumbnail from exported GeoTIFF
-    png_bytes = get_chip_thumbnail(chip['project_id'], chip_id)
+    # Try to get thumbnail rendered from exported GeoTIFF
+    thumbnail_path = get_chip_thumbnail_path(chip['project_id'], chip_id)
 
-    if png_bytes is None:
+    if thumbnail_path is None:
         return jsonify({
             'error': 'Chip has not been exported yet',
             'exported': False
         }), 404
 
-    return Response(png_bytes, mimetype='image/png')
+    return send_file(thumbnail_path, mimetype='image/png', conditional=True)
 
 
 @chips_bp.route('/chips/<chip_id>/mask', methods=['GET'])
@@ -50,19 +50,18 @@ def get_chip_mask_route(chip_id):
     Returns the mask image as PNG bytes (0=black, 255=white).
     Returns 404 if chip doesn't exist, isn't positive, or mask hasn't been generated.
     """
-    db = get_db()
+    db = get_read_db()
 
-    # Get chip and verify it exists
+    # Get chip only if it is positive, in a single primary-key lookup
     chip = db.execute(
-        'SELECT id, project_id, chip_type FROM chips WHERE id = ?',
+        "SELECT project_id FROM chips WHERE id = ? AND chip_type = 'positive'",
         (chip_id,)
     ).fetchone()
 
     if not chip:
-        return jsonify({'error': 'Chip not found'}), 404
-
-    if chip['chip_type'] != 'positive':
-        return jsonify({'error': 'Masks are only available for positive chips'}), 404
+        return jsonify({
+            'error': 'Chip not found. Masks are only available for positive chips'
+        }), 404
 
     # Try to get mask PNG
     png_bytes = get_mask_png(chip['project_id'], chip_id)
@@ -83,21 +82,17 @@ def check_chip_mask_exists(chip_id):
 
     Returns 200 if mask exists, 404 otherwise.
     """
-    db = get_db()
+    db = get_read_db()
 
-    chip = db.execute(
-        'SELECT id, project_id, chip_type FROM chips WHERE id = ?',
+    # Mask existence is tracked in chip_assets, so no filesystem stat is needed
+    row = db.execute(
+        """SELECT 1 FROM chips
+           JOIN chip_assets ON chip_assets.chip_id = chips.id
+           WHERE chips.id = ? AND chips.chip_type = 'positive' AND chip_assets.has_mask = 1""",
         (chip_id,)
     ).fetchone()
 
-    if not chip or chip['chip_type'] != 'positive':
-        return '', 404
-
-    mask_path = get_chip_mask_path(chip['project_id'], chip_id)
-    if mask_path.exists():
-        return '', 200
-
-    return '', 404
+    return '', 200 if row else 404
 
 
 @chips_bp.route('/chips/<chip_id>/metadata', methods=['GET'])
@@ -108,7 +103,7 @@ def get_chip_metadata_route(chip_id):
     Returns bounds, dimensions, resolution, CRS, and band count.
     Returns 404 if chip doesn't exist or hasn't been exported.
     """
-    db = get_db()
+    db = get_read_db()
 
     # Get chip and its project from database
     chip = db.execute(
@@ -2,18 +2,45 @@
 API endpoints for imagery export status.
 Downloads happen automatically when labels are saved.
 """
-from flask import Blueprint, jsonify
-from app.database import get_db
-from app.workers.export_worker import get_project_download_status
+import orjson
+from flask import Blueprint, jsonify, request
+from app.database import get_read_db
+from app.workers.export_worker import get_download_statuses
 
 exports_bp = Blueprint('exports', __name__)
 
+# In-memory download statuses that override the default 'pending'
+ACTIVE_STATUSES = ('downloading', 'completed', 'failed')
+
+# One row per chip with its resolved download status. Exports recorded in
+# chip_assets are completed; otherwise the in-memory status passed as the
+# :active JSON object applies, defaulting to pending.
+CHIP_STATUS_SQL = '''
+    SELECT c.id, c.chip_type, c.center_lng, c.center_lat,
+           CASE
+               WHEN COALESCE(a.has_export, 0) THEN 'completed'
+               ELSE COALESCE(active.value, 'pending')
+           END AS status
+    FROM chips c
+    LEFT JOIN chip_assets a ON a.chip_id = c.id
+    LEFT JOIN json_each(:active) AS active ON active.key = c.id
+    WHERE c.project_id = :project_id
+'''
+
+
+def _project_exists(db, project_id):
+    """Check for a project; only needed when a project has no chips."""
+    row = db.execute('SELECT 1 FROM projects WHERE id = ?', (project_id,)).fetchone()
+    return row is not None
+
 
 @exports_bp.route('/projects/<int:project_id>/imagery', methods=['GET'])
 def get_imagery_status(project_id):
     """
     Get download status for all chips in a project.
 
+    Pass ``?summary=1`` to get only the counts, without the chips list.
+
     Returns:
     {
         "totalChips": 10,
@@ -27,57 +54,60 @@ def get_imagery_status(project_id):
         ]
     }
     """
-    db = get_db()
+    db = get_read_db()
 
-    # Verify project exists
-    cursor = db.execute('SELECT id FROM projects WHERE id = ?', (project_id,))
-    if cursor.fetchone() is None:
-        return jsonify({'error': 'Project not found'}), 404
+    # In-flight and failed downloads are only tracked in memory; pass them
+    # to SQLite so each chip's status is resolved in the query
+    active_status = orjson.dumps({
+        chip_id: status
+        for chip_id, status in get_download_statuses().items()
+        if status in ACTIVE_STATUSES
+    }).decode()
+    params = {'project_id': project_id, 'active': active_status}
 
-    # Get all chips for this project
-    cursor = db.execute(
-        '''SELECT id, chip_type, center_lng, center_lat
-           FROM chips WHERE project_id = ?''',
-        (project_id,)
-    )
+    if request.args.get('summary', '').lower() in ('1', 'true', 'yes'):
+        counts = dict.fromkeys(('completed', 'downloading', 'pending', 'failed'), 0)
+        for row in db.execute(
+            f'''SELECT status, COUNT(*) AS count
+                FROM ({CHIP_STATUS_SQL})
+                GROUP BY status''',
+            params
+        ):
+            counts[row['status']] = row['count']
 
-    chip_rows = cursor.fetchall()
-    chip_ids = [row['id'] for row in chip_rows]
+        if not any(counts.values()) and not _project_exists(db, project_id):
+            return jsonify({'error': 'Project not found'}), 404
 
-    # Get download status for all chips
-    status_map = get_project_download_status(project_id, chip_ids)
+        return jsonify({
+            'totalChips': sum(counts.values()),
+            'downloadedChips': counts['completed'],
+            'downloadingChips': counts['downloading'],
+            'pendingChips': counts['pending'],
+            'failedChips': counts['failed'],
+        })
 
     chips = []
-    downloaded_count = 0
-    downloading_count = 0
-    pending_count = 0
-    failed_count = 0
-
-    for row in chip_rows:
-        chip_id = row['id']
-        status = status_map.get(chip_id, 'pending')
-
-        if status == 'completed':
-            downloaded_count += 1
-        elif status == 'downloading':
-            downloading_count += 1
-        elif status == 'failed':
-            failed_count += 1
-        else:
-            pending_count += 1
+    counts = {'completed': 0, 'downloading': 0, 'pending': 0, 'failed': 0}
+
+    for row in db.execute(CHIP_STATUS_SQL, params):
+        status = row['status']
+        counts[status] += 1
 
         chips.append({
-            'chipId': chip_id,
+            'chipId': row['id'],
             'status': status,
             'type': row['chip_type'],
             'center': {'lng': row['center_lng'], 'lat': row['center_lat']},
         })
 
+    if not chips and not _project_exists(db, project_id):
+        return jsonify({'error': 'Project not found'}), 404
+
     return jsonify({
         'totalChips': len(chips),
-        'downloadedChips': downloaded_count,
-        'downloadingChips': downloading_count,
-        'pendingChips': pending_count,
-        'failedChips': failed_count,
+        'downloadedChips': counts['completed'],
+        'downloadingChips': counts['downloading'],
+        'pendingChips': counts['pending'],
+        'failedChips': counts['failed'],
         'chips': chips,
     })
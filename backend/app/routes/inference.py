@@ -1,12 +1,20 @@
 """Inference API routes."""
-import json
 import os
 from datetime import datetime
 
-from flask import Blueprint, jsonify, request, send_file
+import orjson
+from flask import Blueprint, current_app, jsonify, request, send_file
 
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.config import INFERENCE_DIR
+from app.routes.polling import polled_json
+from app.routes.schemas import Bounds, SchemaError
+from app.services.job_cache import (
+    completed_inference_cache,
+    invalidate_inference,
+    latest_inference_cache,
+    trained_model_cache
+)
 from app.workers.inference_worker import (
     queue_inference_job,
     cancel_inference_job,
@@ -15,121 +23,126 @@ from app.workers.inference_worker import (
 
 inference_bp = Blueprint('inference', __name__)
 
+# Cache lifetime for inference overlays (one year; they are immutable per job)
+OVERLAY_MAX_AGE = 365 * 24 * 60 * 60
+
+# An inference_jobs row serialized by SQLite's json_object() (keys sorted
+# like jsonify), so the stored bounds JSON is never parsed in Python
+INFERENCE_JOB_JSON = '''json_object(
+    'bounds', json(bounds_geojson),
+    'completed_at', completed_at,
+    'created_at', created_at,
+    'error_message', error_message,
+    'id', id,
+    'output_path', output_path,
+    'progress', progress,
+    'progress_message', progress_message,
+    'status', status,
+    'training_job_id', training_job_id
+)'''
+
 
 @inference_bp.route('/projects/<int:project_id>/inference', methods=['GET'])
 def list_inference_jobs(project_id):
     """List all inference jobs for a project."""
-    db = get_db()
+    db = get_read_db()
 
-    jobs = db.execute(
-        '''SELECT id, training_job_id, status, bounds_geojson, progress,
-                  progress_message, output_path, error_message, created_at, completed_at
+    rows = db.execute(
+        f'''SELECT {INFERENCE_JOB_JSON}
            FROM inference_jobs
            WHERE project_id = ?
            ORDER BY created_at DESC''',
         (project_id,)
     ).fetchall()
 
-    return jsonify({
-        'jobs': [
-            {
-                'id': job['id'],
-                'training_job_id': job['training_job_id'],
-                'status': job['status'],
-                'bounds': json.loads(job['bounds_geojson']),
-                'progress': job['progress'],
-                'progress_message': job['progress_message'],
-                'output_path': job['output_path'],
-                'error_message': job['error_message'],
-                'created_at': job['created_at'],
-                'completed_at': job['completed_at'],
-            }
-            for job in jobs
-        ]
-    })
+    body = '{"jobs":[' + ','.join(row[0] for row in rows) + ']}\n'
+    return current_app.response_class(body, mimetype='application/json')
 
 
 @inference_bp.route('/projects/<int:project_id>/inference', methods=['POST'])
 def start_inference_job(project_id):
     """Start a new inference job for a project."""
-    db = get_db()
-
-    # Check project exists
-    project = db.execute(
-        'SELECT id FROM projects WHERE id = ?',
-        (project_id,)
-    ).fetchone()
-
-    if not project:
-        return jsonify({'error': 'Project not found'}), 404
-
     # Get request data
     data = request.get_json() or {}
-    bounds = data.get('bounds')
-
-    if not bounds:
+    if not data.get('bounds'):
         return jsonify({'error': 'Missing bounds parameter'}), 400
 
-    # Validate bounds
-    required_keys = ['west', 'south', 'east', 'north']
-    if not all(key in bounds for key in required_keys):
-        return jsonify({
-            'error': f'Bounds must include: {", ".join(required_keys)}'
-        }), 400
+    # Reject malformed bounds before any database work
+    try:
+        bounds = Bounds.from_json(data['bounds']).to_dict()
+    except SchemaError as e:
+        return jsonify({'error': str(e)}), 400
 
-    # Check if there's already a running or pending job
-    existing = db.execute(
-        '''SELECT id, status FROM inference_jobs
-           WHERE project_id = ? AND status IN ('pending', 'downloading', 'inferring')''',
-        (project_id,)
+    db = get_db()
+
+    # Look up the project, any active inference job and the latest trained
+    # model in one round trip. Always returns exactly one row.
+    state = db.execute(
+        '''SELECT project.id AS project_id,
+                  active.id AS active_job_id,
+                  active.status AS active_status,
+                  model.id AS training_job_id,
+                  model.checkpoint_path AS checkpoint_path
+           FROM (SELECT :project_id AS id) AS requested
+           LEFT JOIN projects AS project ON project.id = requested.id
+           LEFT JOIN (
+               SELECT id, status FROM inference_jobs
+               WHERE project_id = :project_id
+                 AND status IN ('pending', 'downloading', 'inferring')
+               LIMIT 1
+           ) AS active ON 1
+           LEFT JOIN (
+               SELECT id, checkpoint_path FROM training_jobs
+               WHERE project_id = :project_id AND status = 'completed' AND checkpoint_path IS NOT NULL
+               ORDER BY completed_at DESC
+               LIMIT 1
+           ) AS model ON 1''',
+        {'project_id': project_id}
     ).fetchone()
 
-    if existing:
+    if state['project_id'] is None:
+        return jsonify({'error': 'Project not found'}), 404
+
+    # Check if there's already a running or pending job
+    if state['active_job_id'] is not None:
         return jsonify({
-            'error': f'An inference job is already {existing["status"]}',
-            'job_id': existing['id']
+            'error': f'An inference job is already {state["active_status"]}',
+            'job_id': state['active_job_id']
         }), 409
 
-    # Get the most recent completed training job
-    training_job = db.execute(
-        '''SELECT id, checkpoint_path FROM training_jobs
-           WHERE project_id = ? AND status = 'completed' AND checkpoint_path IS NOT NULL
-           ORDER BY completed_at DESC
-           LIMIT 1''',
-        (project_id,)
-    ).fetchone()
-
-    if not training_job:
+    # Require a completed training job
+    if state['training_job_id'] is None:
         return jsonify({
             'error': 'No completed training job found. Train a model first.'
         }), 400
 
-    checkpoint_path = training_job['checkpoint_path']
+    checkpoint_path = state['checkpoint_path']
     if not os.path.exists(checkpoint_path):
         return jsonify({
             'error': 'Model checkpoint not found. Train a new model.'
         }), 400
 
     # Create inference job
-    bounds_json = json.dumps(bounds)
+    # Stored with sorted keys so it can be passed through to responses as-is
+    bounds_json = orjson.dumps(bounds, option=orjson.OPT_SORT_KEYS).decode()
     now = datetime.utcnow().isoformat()
 
     cursor = db.execute(
         '''INSERT INTO inference_jobs
            (project_id, training_job_id, status, bounds_geojson, created_at)
            VALUES (?, ?, 'pending', ?, ?)''',
-        (project_id, training_job['id'], bounds_json, now)
+        (project_id, state['training_job_id'], bounds_json, now)
     )
     db.commit()
 
     job_id = cursor.lastrowid
 
     # Queue the job
-    queue_inference_job(job_id, project_id, bounds, checkpoint_path)
+    queue_inference_job(job_id, project_id)
 
     return jsonify({
         'id': job_id,
-        'training_job_id': training_job['id'],
+        'training_job_id': state['training_job_id'],
         'status': 'pending',
         'bounds': bounds,
         'progress': 0,
@@ -141,11 +154,10 @@ def start_inference_job(project_id):
 @inference_bp.route('/projects/<int:project_id>/inference/<int:job_id>', methods=['GET'])
 def get_inference_job(project_id, job_id):
     """Get status and progress for a specific inference job."""
-    db = get_db()
+    db = get_read_db()
 
     job = db.execute(
-        '''SELECT id, training_job_id, status, bounds_geojson, progress,
-                  progress_message, output_path, error_message, created_at, completed_at
+        f'''SELECT {INFERENCE_JOB_JSON}
            FROM inference_jobs
            WHERE id = ? AND project_id = ?''',
         (job_id, project_id)
@@ -154,18 +166,7 @@ def get_inference_job(project_id, job_id):
     if not job:
         return jsonify({'error': 'Inference job not found'}), 404
 
-    return jsonify({
-        'id': job['id'],
-        'training_job_id': job['training_job_id'],
-        'status': job['status'],
-        'bounds': json.loads(job['bounds_geojson']),
-        'progress': job['progress'],
-        'progress_message': job['progress_message'],
-        'output_path': job['output_path'],
-        'error_message': job['error_message'],
-        'created_at': job['created_at'],
-        'completed_at': job['completed_at'],
-    })
+    return polled_json(job[0])
 
 
 @inference_bp.route('/projects/<int:project_id>/inference/<int:job_id>', methods=['DELETE'])
@@ -202,67 +203,94 @@ def cancel_inference(project_id, job_id):
         (job_id,)
     )
     db.commit()
+    invalidate_inference(project_id)
 
     return jsonify({'message': 'Inference job cancelled'})
 
 
-@inference_bp.route('/projects/<int:project_id>/inference/<int:job_id>/overlay', methods=['GET'])
-def get_inference_overlay(project_id, job_id):
-    """Get the probability overlay PNG for a completed inference job."""
-    db = get_db()
+def _load_overlay_job(project_id, job_id):
+    """
+    Look up a job's status, overlay path and bounds response body.
 
-    job = db.execute(
-        '''SELECT status, output_path, bounds_geojson FROM inference_jobs
+    Completed jobs are immutable, so once a job has completed its row is
+    served from memory and the overlay and bounds routes skip the database.
+    Returns None if the job doesn't exist.
+    """
+    key = (project_id, job_id)
+    job = completed_inference_cache.get(key)
+    if job is not None:
+        return job
+
+    row = get_read_db().execute(
+        '''SELECT status, output_path, json_object('bounds', json(bounds_geojson))
+           FROM inference_jobs
            WHERE id = ? AND project_id = ?''',
         (job_id, project_id)
     ).fetchone()
 
+    if row is None:
+        return None
+
+    job = tuple(row)
+    if job[0] == 'completed':
+        completed_inference_cache.set(key, job)
+    return job
+
+
+@inference_bp.route('/projects/<int:project_id>/inference/<int:job_id>/overlay', methods=['GET'])
+def get_inference_overlay(project_id, job_id):
+    """Get the probability overlay PNG for a completed inference job."""
+    job = _load_overlay_job(project_id, job_id)
+
     if not job:
         return jsonify({'error': 'Inference job not found'}), 404
 
-    if job['status'] != 'completed':
+    status, output_path, _ = job
+    if status != 'completed':
         return jsonify({
-            'error': f'Inference job not completed. Status: {job["status"]}'
+            'error': f'Inference job not completed. Status: {status}'
         }), 400
 
-    output_path = job['output_path']
-    if not output_path or not os.path.exists(output_path):
+    try:
+        st = os.stat(output_path) if output_path else None
+    except FileNotFoundError:
+        st = None
+    if st is None:
         return jsonify({'error': 'Overlay file not found'}), 404
 
-    return send_file(
+    # A completed job's overlay never changes, so let browsers keep it and
+    # answer revalidations with 304s
+    response = send_file(
         output_path,
         mimetype='image/png',
-        as_attachment=False
+        as_attachment=False,
+        conditional=True,
+        etag=f'{st.st_mtime_ns}-{st.st_size}',
+        last_modified=st.st_mtime,
+        max_age=OVERLAY_MAX_AGE,
     )
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
 
 
 @inference_bp.route('/projects/<int:project_id>/inference/<int:job_id>/bounds', methods=['GET'])
 def get_inference_bounds(project_id, job_id):
     """Get the bounds for positioning the overlay on the map."""
-    db = get_db()
-
-    job = db.execute(
-        '''SELECT bounds_geojson FROM inference_jobs
-           WHERE id = ? AND project_id = ?''',
-        (job_id, project_id)
-    ).fetchone()
+    job = _load_overlay_job(project_id, job_id)
 
     if not job:
         return jsonify({'error': 'Inference job not found'}), 404
 
-    return jsonify({
-        'bounds': json.loads(job['bounds_geojson'])
-    })
+    return current_app.response_class(job[2] + '\n', mimetype='application/json')
 
 
-@inference_bp.route('/projects/<int:project_id>/inference/latest', methods=['GET'])
-def get_latest_inference(project_id):
-    """Get the most recent completed inference job for a project."""
-    db = get_db()
+def _resolve_latest_inference(project_id):
+    """Load the most recent completed inference job for a project as a JSON document."""
+    db = get_read_db()
 
     job = db.execute(
-        '''SELECT id, training_job_id, status, bounds_geojson, progress,
-                  progress_message, output_path, error_message, created_at, completed_at
+        f'''SELECT {INFERENCE_JOB_JSON}
            FROM inference_jobs
            WHERE project_id = ? AND status = 'completed'
            ORDER BY completed_at DESC
@@ -270,27 +298,25 @@ def get_latest_inference(project_id):
         (project_id,)
     ).fetchone()
 
-    if not job:
+    return job[0] if job else None
+
+
+@inference_bp.route('/projects/<int:project_id>/inference/latest', methods=['GET'])
+def get_latest_inference(project_id):
+    """Get the most recent completed inference job for a project."""
+    job = latest_inference_cache.get_or_load(
+        project_id, lambda: _resolve_latest_inference(project_id)
+    )
+
+    if job is None:
         return jsonify({'error': 'No completed inference jobs found'}), 404
 
-    return jsonify({
-        'id': job['id'],
-        'training_job_id': job['training_job_id'],
-        'status': job['status'],
-        'bounds': json.loads(job['bounds_geojson']),
-        'progress': job['progress'],
-        'progress_message': job['progress_message'],
-        'output_path': job['output_path'],
-        'error_message': job['error_message'],
-        'created_at': job['created_at'],
-        'completed_at': job['completed_at'],
-    })
+    return polled_json(job)
 
 
-@inference_bp.route('/projects/<int:project_id>/has-trained-model', methods=['GET'])
-def check_has_trained_model(project_id):
-    """Check if the project has a completed training job with a valid model."""
-    db = get_db()
+def _resolve_trained_model(project_id):
+    """Find the latest completed training job and whether its checkpoint exists."""
+    db = get_read_db()
 
     training_job = db.execute(
         '''SELECT id, checkpoint_path FROM training_jobs
@@ -304,7 +330,16 @@ def check_has_trained_model(project_id):
     if training_job and training_job['checkpoint_path']:
         has_model = os.path.exists(training_job['checkpoint_path'])
 
-    return jsonify({
+    return {
         'has_model': has_model,
         'training_job_id': training_job['id'] if training_job else None
-    })
+    }
+
+
+@inference_bp.route('/projects/<int:project_id>/has-trained-model', methods=['GET'])
+def check_has_trained_model(project_id):
+    """Check if the project has a completed training job with a valid model."""
+    # Polled by the UI, so both the query and the stat are cached briefly
+    return polled_json(trained_model_cache.get_or_load(
+        project_id, lambda: _resolve_trained_model(project_id)
+    ))
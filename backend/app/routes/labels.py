@@ -1,7 +1,8 @@
-import json
 from datetime import datetime
-from flask import Blueprint, jsonify, request
-from app.database import get_db
+import orjson
+from flask import Blueprint, current_app, jsonify, request
+from app.database import get_db, get_read_db, transaction
+from app.routes.schemas import SaveLabelsBody, SchemaError
 from app.workers.export_worker import queue_chip_downloads
 from app.services.mask_service import regenerate_all_masks_for_project
 
@@ -11,104 +12,111 @@ labels_bp = Blueprint('labels', __name__)
 @labels_bp.route('/projects/<int:project_id>/labels', methods=['GET'])
 def get_labels(project_id):
     """Get all chips and polygons for a project."""
-    db = get_db()
-
-    # Verify project exists
-    cursor = db.execute('SELECT id FROM projects WHERE id = ?', (project_id,))
-    if cursor.fetchone() is None:
+    db = get_read_db()
+
+    # Check the project and build the whole response body in one statement.
+    # json_object() keys are sorted like jsonify, and stored geometries are
+    # passed through without a Python round trip.
+    row = db.execute(
+        '''SELECT
+               EXISTS (SELECT 1 FROM projects WHERE id = :project_id) AS project_exists,
+               json_object(
+                   'chips', (
+                       SELECT json_group_array(json_object(
+                           'center', json_object('lat', center_lat, 'lng', center_lng),
+                           'createdAt', created_at,
+                           'geometry', json(geometry_geojson),
+                           'id', id,
+                           'type', chip_type
+                       ))
+                       FROM chips WHERE project_id = :project_id
+                   ),
+                   'polygons', (
+                       SELECT json_group_array(json_object(
+                           'chipId', p.chip_id,
+                           'createdAt', p.created_at,
+                           'geometry', json(p.geometry_geojson),
+                           'id', p.id
+                       ))
+                       FROM polygons p
+                       JOIN chips c ON p.chip_id = c.id
+                       WHERE c.project_id = :project_id
+                   )
+               ) AS body''',
+        {'project_id': project_id}
+    ).fetchone()
+
+    if not row['project_exists']:
         return jsonify({'error': 'Project not found'}), 404
 
-    # Get all chips for this project
-    cursor = db.execute(
-        '''SELECT id, geometry_geojson, center_lng, center_lat, chip_type, created_at
-           FROM chips WHERE project_id = ?''',
-        (project_id,)
-    )
-    chips = []
-    for row in cursor.fetchall():
-        chips.append({
-            'id': row['id'],
-            'geometry': json.loads(row['geometry_geojson']),
-            'center': {'lng': row['center_lng'], 'lat': row['center_lat']},
-            'type': row['chip_type'],
-            'createdAt': row['created_at']
-        })
-
-    # Get all polygons for chips in this project
-    cursor = db.execute(
-        '''SELECT p.id, p.chip_id, p.geometry_geojson, p.created_at
-           FROM polygons p
-           JOIN chips c ON p.chip_id = c.id
-           WHERE c.project_id = ?''',
-        (project_id,)
-    )
-    polygons = []
-    for row in cursor.fetchall():
-        polygons.append({
-            'id': row['id'],
-            'chipId': row['chip_id'],
-            'geometry': json.loads(row['geometry_geojson']),
-            'createdAt': row['created_at']
-        })
-
-    return jsonify({'chips': chips, 'polygons': polygons})
+    return current_app.response_class(row['body'] + '\n', mimetype='application/json')
 
 
 @labels_bp.route('/projects/<int:project_id>/labels', methods=['POST'])
 def save_labels(project_id):
     """Save chips and polygons for a project (replaces all existing data)."""
-    db = get_db()
-
-    # Verify project exists
-    cursor = db.execute('SELECT id FROM projects WHERE id = ?', (project_id,))
-    if cursor.fetchone() is None:
-        return jsonify({'error': 'Project not found'}), 404
-
     data = request.get_json()
     if not data:
         return jsonify({'error': 'Request body is required'}), 400
 
-    chips = data.get('chips', [])
-    polygons = data.get('polygons', [])
+    # Reject malformed labels before any database work
+    try:
+        body = SaveLabelsBody.from_json(data)
+    except SchemaError as e:
+        return jsonify({'error': str(e)}), 400
 
-    # Delete existing labels for this project
-    db.execute('DELETE FROM chips WHERE project_id = ?', (project_id,))
+    now = datetime.utcnow().isoformat() + 'Z'
 
-    # Insert new chips
-    for chip in chips:
-        db.execute(
+    # Rows are sorted by id so the bulk inserts append to the WITHOUT ROWID
+    # primary key B-trees in key order instead of splitting pages at random
+    chip_rows = sorted([
+        (
+            chip.id,
+            project_id,
+            orjson.dumps(chip.geometry).decode(),
+            chip.center_lng,
+            chip.center_lat,
+            chip.type,
+            chip.created_at or now
+        )
+        for chip in body.chips
+    ])
+    polygon_rows = sorted([
+        (
+            polygon.id,
+            polygon.chip_id,
+            orjson.dumps(polygon.geometry).decode(),
+            polygon.created_at or now
+        )
+        for polygon in body.polygons
+    ])
+
+    db = get_db()
+
+    # Replace labels in a single write transaction
+    with transaction(db):
+        # Touching the project doubles as the existence check
+        cursor = db.execute(
+            'UPDATE projects SET updated_at = ? WHERE id = ?', (now, project_id)
+        )
+        if cursor.rowcount == 0:
+            return jsonify({'error': 'Project not found'}), 404
+
+        # Delete existing labels for this project
+        db.execute('DELETE FROM chips WHERE project_id = ?', (project_id,))
+
+        # Insert new chips and polygons
+        db.executemany(
             '''INSERT INTO chips (id, project_id, geometry_geojson, center_lng, center_lat, chip_type, created_at)
                VALUES (?, ?, ?, ?, ?, ?, ?)''',
-            (
-                chip['id'],
-                project_id,
-                json.dumps(chip['geometry']),
-                chip['center']['lng'],
-                chip['center']['lat'],
-                chip['type'],
-                chip.get('createdAt', datetime.utcnow().isoformat() + 'Z')
-            )
+            chip_rows
         )
-
-    # Insert new polygons
-    for polygon in polygons:
-        db.execute(
+        db.executemany(
             '''INSERT INTO polygons (id, chip_id, geometry_geojson, created_at)
                VALUES (?, ?, ?, ?)''',
-            (
-                polygon['id'],
-                polygon['chipId'],
-                json.dumps(polygon['geometry']),
-                polygon.get('createdAt', datetime.utcnow().isoformat() + 'Z')
-            )
+            polygon_rows
         )
 
-    # Update project's updated_at timestamp
-    now = datetime.utcnow().isoformat() + 'Z'
-    db.execute('UPDATE projects SET updated_at = ? WHERE id = ?', (now, project_id))
-
-    db.commit()
-
     # Regenerate masks for positive chips that have exported imagery
     masks_generated = regenerate_all_masks_for_project(project_id)
 
@@ -117,8 +125,8 @@ def save_labels(project_id):
 
     return jsonify({
         'message': 'Labels saved successfully',
-        'chipCount': len(chips),
-        'polygonCount': len(polygons),
+        'chipCount': len(body.chips),
+        'polygonCount': len(body.polygons),
         'masksGenerated': masks_generated
     })
 
@@ -127,19 +135,17 @@ def save_labels(project_id):
 def clear_labels(project_id):
     """Clear all labels for a project."""
     db = get_db()
-
-    # Verify project exists
-    cursor = db.execute('SELECT id FROM projects WHERE id = ?', (project_id,))
-    if cursor.fetchone() is None:
-        return jsonify({'error': 'Project not found'}), 404
-
-    # Delete all chips (polygons cascade)
-    db.execute('DELETE FROM chips WHERE project_id = ?', (project_id,))
-
-    # Update project's updated_at timestamp
     now = datetime.utcnow().isoformat() + 'Z'
-    db.execute('UPDATE projects SET updated_at = ? WHERE id = ?', (now, project_id))
 
-    db.commit()
+    with transaction(db):
+        # Touching the project doubles as the existence check
+        cursor = db.execute(
+            'UPDATE projects SET updated_at = ? WHERE id = ?', (now, project_id)
+        )
+        if cursor.rowcount == 0:
+            return jsonify({'error': 'Project not found'}), 404
+
+        # Delete all chips (polygons cascade)
+        db.execute('DELETE FROM chips WHERE project_id = ?', (project_id,))
 
     return jsonify({'message': 'Labels cleared successfully'})
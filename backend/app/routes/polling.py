@@ -0,0 +1,24 @@
+"""
+Helpers for endpoints the frontend polls while jobs run.
+"""
+from flask import Response, current_app, jsonify, request
+
+
+def polled_json(payload) -> Response:
+    """
+    Build a JSON response that answers repeat polls with 304 Not Modified.
+
+    The ETag is a hash of the body, so it changes exactly when the status,
+    progress or metrics do. ``no-cache`` makes browsers revalidate on every
+    poll instead of reusing the response blindly.
+
+    ``payload`` may also be a JSON document already serialized by SQLite,
+    which is sent as-is.
+    """
+    if isinstance(payload, str):
+        response = current_app.response_class(payload + '\n', mimetype='application/json')
+    else:
+        response = jsonify(payload)
+    response.add_etag()
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
@@ -1,18 +1,37 @@
 from datetime import datetime
 from flask import Blueprint, jsonify, request
-from app.database import get_db
+from app.database import get_db, get_read_db
+from app.services.job_cache import invalidate_project
 
 projects_bp = Blueprint('projects', __name__)
 
 
 @projects_bp.route('/projects', methods=['GET'])
 def list_projects():
-    """List all projects."""
-    db = get_db()
+    """
+    List all projects, with the per-project state the dashboard shows.
+
+    Chip counts and job status come from indexed subqueries in the same
+    statement, so the dashboard doesn't need follow-up calls per project.
+    """
+    db = get_read_db()
     cursor = db.execute(
-        'SELECT id, name, description, created_at, updated_at FROM projects ORDER BY updated_at DESC'
+        '''SELECT p.id, p.name, p.description, p.created_at, p.updated_at,
+                  (SELECT COUNT(*) FROM chips WHERE project_id = p.id) AS chip_count,
+                  (SELECT id FROM training_jobs
+                   WHERE project_id = p.id AND status = 'completed'
+                   ORDER BY completed_at DESC
+                   LIMIT 1) AS latest_training_id,
+                  EXISTS (SELECT 1 FROM inference_jobs
+                          WHERE project_id = p.id AND status = 'completed') AS has_inference
+           FROM projects p
+           ORDER BY p.updated_at DESC'''
     )
-    projects = [dict(row) for row in cursor.fetchall()]
+    projects = []
+    for row in cursor.fetchall():
+        project = dict(row)
+        project['has_inference'] = bool(project['has_inference'])
+        projects.append(project)
     return jsonify(projects)
 
 
@@ -49,7 +68,7 @@ def create_project():
 @projects_bp.route('/projects/<int:project_id>', methods=['GET'])
 def get_project(project_id):
     """Get a single project by ID."""
-    db = get_db()
+    db = get_read_db()
     cursor = db.execute(
         'SELECT id, name, description, created_at, updated_at FROM projects WHERE id = ?',
         (project_id,)
@@ -67,13 +86,13 @@ def delete_project(project_id):
     """Delete a project and all its associated data."""
     db = get_db()
 
-    # Check if project exists
-    cursor = db.execute('SELECT id FROM projects WHERE id = ?', (project_id,))
-    if cursor.fetchone() is None:
+    # Delete project (cascades to chips and polygons via foreign keys);
+    # no deleted row means the project didn't exist
+    cursor = db.execute('DELETE FROM projects WHERE id = ?', (project_id,))
+    db.commit()
+    if cursor.rowcount == 0:
         return jsonify({'error': 'Project not found'}), 404
 
-    # Delete project (cascades to chips and polygons via foreign keys)
-    db.execute('DELETE FROM projects WHERE id = ?', (project_id,))
-    db.commit()
+    invalidate_project(project_id)
 
     return jsonify({'message': 'Project deleted successfully'})
@@ -0,0 +1,155 @@
+"""
+Request body schemas for the API routes.
+
+Each schema parses a decoded JSON body into a typed, immutable record and
+raises SchemaError on missing fields, wrong types or out-of-range values, so
+handlers can reject malformed input before touching the database.
+"""
+from dataclasses import asdict, dataclass
+from typing import Any, Optional
+
+CHIP_TYPES = ('positive', 'negative')
+
+
+class SchemaError(ValueError):
+    """Raised when a request body does not match its schema."""
+
+
+def _object(value: Any, name: str) -> dict:
+    if not isinstance(value, dict):
+        raise SchemaError(f'{name} must be an object')
+    return value
+
+
+def _array(value: Any, name: str) -> list:
+    if not isinstance(value, list):
+        raise SchemaError(f'{name} must be an array')
+    return value
+
+
+def _string(data: dict, key: str, name: str) -> str:
+    value = data.get(key)
+    if not isinstance(value, str) or not value:
+        raise SchemaError(f'{name}.{key} must be a non-empty string')
+    return value
+
+
+def _number(data: dict, key: str, name: str, low: float, high: float) -> float:
+    value = data.get(key)
+    # bool is a subclass of int but never a valid coordinate
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise SchemaError(f'{name}.{key} must be a number')
+    if not low <= value <= high:
+        raise SchemaError(f'{name}.{key} must be between {low:g} and {high:g}')
+    return float(value)
+
+
+def _optional_string(data: dict, key: str, name: str) -> Optional[str]:
+    value = data.get(key)
+    if value is not None and not isinstance(value, str):
+        raise SchemaError(f'{name}.{key} must be a string')
+    return value
+
+
+def _geometry(data: dict, name: str) -> dict:
+    geometry = _object(data.get('geometry'), f'{name}.geometry')
+    if not isinstance(geometry.get('type'), str) or 'coordinates' not in geometry:
+        raise SchemaError(f'{name}.geometry must be a GeoJSON geometry')
+    return geometry
+
+
+@dataclass(frozen=True, slots=True)
+class Bounds:
+    """WGS84 bounding box in degrees."""
+
+    west: float
+    south: float
+    east: float
+    north: float
+
+    @classmethod
+    def from_json(cls, value: Any, name: str = 'bounds') -> 'Bounds':
+        data = _object(value, name)
+        bounds = cls(
+            west=_number(data, 'west', name, -180, 180),
+            south=_number(data, 'south', name, -90, 90),
+            east=_number(data, 'east', name, -180, 180),
+            north=_number(data, 'north', name, -90, 90),
+        )
+        if bounds.south >= bounds.north:
+            raise SchemaError(f'{name}.south must be less than {name}.north')
+        if bounds.west >= bounds.east:
+            raise SchemaError(f'{name}.west must be less than {name}.east')
+        return bounds
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+@dataclass(frozen=True, slots=True)
+class ChipIn:
+    """A labeled chip as sent by the frontend."""
+
+    id: str
+    geometry: dict
+    center_lng: float
+    center_lat: float
+    type: str
+    created_at: Optional[str]
+
+    @classmethod
+    def from_json(cls, value: Any, name: str) -> 'ChipIn':
+        data = _object(value, name)
+        center = _object(data.get('center'), f'{name}.center')
+        chip_type = data.get('type')
+        if chip_type not in CHIP_TYPES:
+            raise SchemaError(f'{name}.type must be one of: {", ".join(CHIP_TYPES)}')
+        return cls(
+            id=_string(data, 'id', name),
+            geometry=_geometry(data, name),
+            center_lng=_number(center, 'lng', f'{name}.center', -180, 180),
+            center_lat=_number(center, 'lat', f'{name}.center', -90, 90),
+            type=chip_type,
+            created_at=_optional_string(data, 'createdAt', name),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class PolygonIn:
+    """A labeled polygon as sent by the frontend."""
+
+    id: str
+    chip_id: str
+    geometry: dict
+    created_at: Optional[str]
+
+    @classmethod
+    def from_json(cls, value: Any, name: str) -> 'PolygonIn':
+        data = _object(value, name)
+        return cls(
+            id=_string(data, 'id', name),
+            chip_id=_string(data, 'chipId', name),
+            geometry=_geometry(data, name),
+            created_at=_optional_string(data, 'createdAt', name),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class SaveLabelsBody:
+    """Body of POST /projects/<id>/labels."""
+
+    chips: tuple[ChipIn, ...]
+    polygons: tuple[PolygonIn, ...]
+
+    @classmethod
+    def from_json(cls, value: Any) -> 'SaveLabelsBody':
+        data = _object(value, 'body')
+        chips = _array(data.get('chips', []), 'chips')
+        polygons = _array(data.get('polygons', []), 'polygons')
+        return cls(
+            chips=tuple(ChipIn.from_json(chip, f'chips[{i}]') for i, chip in enumerate(chips)),
+            polygons=tuple(
+                PolygonIn.from_json(polygon, f'polygons[{i}]')
+                for i, polygon in enumerate(polygons)
+            ),
+        )
@@ -1,51 +1,51 @@
 """Training API routes."""
-import json
 from datetime import datetime
 
-from flask import Blueprint, jsonify, request
+import orjson
+from flask import Blueprint, current_app, jsonify, request
 
-from app.database import get_db
-from app.ml.trainer import TRAINING_CONFIG
+from app.database import get_db, get_read_db
+from app.ml.config import TRAINING_CONFIG
+from app.routes.polling import polled_json
+from app.services.job_cache import invalidate_training, latest_training_cache
 from app.workers.training_worker import queue_training_job, cancel_training_job, get_current_training_job
 
 training_bp = Blueprint('training', __name__)
 
+# A training_jobs row serialized by SQLite's json_object() (keys sorted like
+# jsonify), so the stored config JSON is never parsed in Python
+TRAINING_JOB_JSON = '''json_object(
+    'checkpoint_path', checkpoint_path,
+    'completed_at', completed_at,
+    'config', json(config_json),
+    'created_at', created_at,
+    'current_epoch', current_epoch,
+    'error_message', error_message,
+    'id', id,
+    'started_at', started_at,
+    'status', status,
+    'total_epochs', total_epochs,
+    'train_loss', train_loss,
+    'val_iou', val_iou,
+    'val_loss', val_loss
+)'''
+
 
 @training_bp.route('/projects/<int:project_id>/training', methods=['GET'])
 def list_training_jobs(project_id):
     """List all training jobs for a project."""
-    db = get_db()
+    db = get_read_db()
 
-    jobs = db.execute(
-        '''SELECT id, status, config_json, started_at, completed_at,
-                  current_epoch, total_epochs, train_loss, val_loss, val_iou,
-                  checkpoint_path, error_message, created_at
+    rows = db.execute(
+        f'''SELECT {TRAINING_JOB_JSON}
            FROM training_jobs
            WHERE project_id = ?
            ORDER BY created_at DESC''',
         (project_id,)
     ).fetchall()
 
-    return jsonify({
-        'jobs': [
-            {
-                'id': job['id'],
-                'status': job['status'],
-                'config': json.loads(job['config_json']),
-                'started_at': job['started_at'],
-                'completed_at': job['completed_at'],
-                'current_epoch': job['current_epoch'],
-                'total_epochs': job['total_epochs'],
-                'train_loss': job['train_loss'],
-                'val_loss': job['val_loss'],
-                'val_iou': job['val_iou'],
-                'checkpoint_path': job['checkpoint_path'],
-                'error_message': job['error_message'],
-                'created_at': job['created_at'],
-            }
-            for job in jobs
-        ]
-    })
+    body = '{"jobs":[' + ','.join(row[0] for row in rows) + ']}\n'
+    return current_app.response_class(body, mimetype='application/json')
 
 
 @training_bp.route('/projects/<int:project_id>/training', methods=['POST'])
@@ -53,51 +53,53 @@ def start_training_job(project_id):
     """Start a new training job for a project."""
     db = get_db()
 
-    # Check project exists
-    project = db.execute(
-        'SELECT id FROM projects WHERE id = ?',
-        (project_id,)
+    # Look up the project, any active training job and the positive chip
+    # count in one round trip. Always returns exactly one row.
+    state = db.execute(
+        '''SELECT project.id AS project_id,
+                  active.id AS active_job_id,
+                  active.status AS active_status,
+                  (SELECT COUNT(*) FROM chips
+                   WHERE project_id = :project_id AND chip_type = 'positive') AS positive_count
+           FROM (SELECT :project_id AS id) AS requested
+           LEFT JOIN projects AS project ON project.id = requested.id
+           LEFT JOIN (
+               SELECT id, status FROM training_jobs
+               WHERE project_id = :project_id AND status IN ('pending', 'running')
+               LIMIT 1
+           ) AS active ON 1''',
+        {'project_id': project_id}
     ).fetchone()
 
-    if not project:
+    if state['project_id'] is None:
         return jsonify({'error': 'Project not found'}), 404
 
     # Check if there's already a running or pending job
-    existing = db.execute(
-        '''SELECT id, status FROM training_jobs
-           WHERE project_id = ? AND status IN ('pending', 'running')''',
-        (project_id,)
-    ).fetchone()
-
-    if existing:
+    if state['active_job_id'] is not None:
         return jsonify({
-            'error': f'A training job is already {existing["status"]}',
-            'job_id': existing['id']
+            'error': f'A training job is already {state["active_status"]}',
+            'job_id': state['active_job_id']
         }), 409
 
     # Check that we have positive chips with masks
-    positive_chips = db.execute(
-        '''SELECT COUNT(*) as count FROM chips
-           WHERE project_id = ? AND chip_type = 'positive' ''',
-        (project_id,)
-    ).fetchone()
-
-    if positive_chips['count'] == 0:
+    if state['positive_count'] == 0:
         return jsonify({
             'error': 'No positive chips found. Add positive labels before training.'
         }), 400
 
     # Create training job with fixed config
-    config_json = json.dumps(TRAINING_CONFIG)
+    # Stored with sorted keys so it can be passed through to responses as-is
+    config_json = orjson.dumps(TRAINING_CONFIG.to_dict(), option=orjson.OPT_SORT_KEYS).decode()
     now = datetime.utcnow().isoformat()
 
     cursor = db.execute(
         '''INSERT INTO training_jobs
            (project_id, status, config_json, total_epochs, created_at)
            VALUES (?, 'pending', ?, ?, ?)''',
-        (project_id, config_json, TRAINING_CONFIG['max_epochs'], now)
+        (project_id, config_json, TRAINING_CONFIG.max_epochs, now)
     )
     db.commit()
+    invalidate_training(project_id)
 
     job_id = cursor.lastrowid
 
@@ -107,8 +109,8 @@ def start_training_job(project_id):
     return jsonify({
         'id': job_id,
         'status': 'pending',
-        'config': TRAINING_CONFIG,
-        'total_epochs': TRAINING_CONFIG['max_epochs'],
+        'config': TRAINING_CONFIG.to_dict(),
+        'total_epochs': TRAINING_CONFIG.max_epochs,
         'created_at': now,
     }), 201
 
@@ -116,12 +118,10 @@ def start_training_job(project_id):
 @training_bp.route('/projects/<int:project_id>/training/<int:job_id>', methods=['GET'])
 def get_training_job(project_id, job_id):
     """Get status and metrics for a specific training job."""
-    db = get_db()
+    db = get_read_db()
 
     job = db.execute(
-        '''SELECT id, status, config_json, started_at, completed_at,
-                  current_epoch, total_epochs, train_loss, val_loss, val_iou,
-                  checkpoint_path, error_message, created_at
+        f'''SELECT {TRAINING_JOB_JSON}
            FROM training_jobs
            WHERE id = ? AND project_id = ?''',
         (job_id, project_id)
@@ -130,21 +130,7 @@ def get_training_job(project_id, job_id):
     if not job:
         return jsonify({'error': 'Training job not found'}), 404
 
-    return jsonify({
-        'id': job['id'],
-        'status': job['status'],
-        'config': json.loads(job['config_json']),
-        'started_at': job['started_at'],
-        'completed_at': job['completed_at'],
-        'current_epoch': job['current_epoch'],
-        'total_epochs': job['total_epochs'],
-        'train_loss': job['train_loss'],
-        'val_loss': job['val_loss'],
-        'val_iou': job['val_iou'],
-        'checkpoint_path': job['checkpoint_path'],
-        'error_message': job['error_message'],
-        'created_at': job['created_at'],
-    })
+    return polled_json(job[0])
 
 
 @training_bp.route('/projects/<int:project_id>/training/<int:job_id>', methods=['DELETE'])
@@ -182,19 +168,17 @@ def cancel_training(project_id, job_id):
         (job_id,)
     )
     db.commit()
+    invalidate_training(project_id)
 
     return jsonify({'message': 'Training job cancelled'})
 
 
-@training_bp.route('/projects/<int:project_id>/training/latest', methods=['GET'])
-def get_latest_training(project_id):
-    """Get the most recent training job for a project (any status)."""
-    db = get_db()
+def _resolve_latest_training(project_id):
+    """Load the most recent training job for a project as a JSON document."""
+    db = get_read_db()
 
     job = db.execute(
-        '''SELECT id, status, config_json, started_at, completed_at,
-                  current_epoch, total_epochs, train_loss, val_loss, val_iou,
-                  checkpoint_path, error_message, created_at
+        f'''SELECT {TRAINING_JOB_JSON}
            FROM training_jobs
            WHERE project_id = ?
            ORDER BY created_at DESC
@@ -202,21 +186,18 @@ def get_latest_training(project_id):
         (project_id,)
     ).fetchone()
 
-    if not job:
+    return job[0] if job else None
+
+
+@training_bp.route('/projects/<int:project_id>/training/latest', methods=['GET'])
+def get_latest_training(project_id):
+    """Get the most recent training job for a project (any status)."""
+    # Polled during training, so served from a short-lived cache
+    job = latest_training_cache.get_or_load(
+        project_id, lambda: _resolve_latest_training(project_id)
+    )
+
+    if job is None:
         return jsonify({'error': 'No training jobs found'}), 404
 
-    return jsonify({
-        'id': job['id'],
-        'status': job['status'],
-        'config': json.loads(job['config_json']),
-        'started_at': job['started_at'],
-        'completed_at': job['completed_at'],
-        'current_epoch': job['current_epoch'],
-        'total_epochs': job['total_epochs'],
-        'train_loss': job['train_loss'],
-        'val_loss': job['val_loss'],
-        'val_iou': job['val_iou'],
-        'checkpoint_path': job['checkpoint_path'],
-        'error_message': job['error_message'],
-        'created_at': job['created_at'],
-    })
+    return polled_json(job)
@@ -1,15 +1,22 @@
 """
 Google Earth Engine service for Sentinel-2 imagery export.
 """
+import hashlib
 import json
 import os
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 import ee
+import orjson
+import rasterio.shutil
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-from app.config import GEE_SERVICE_ACCOUNT_PATH, EXPORTS_DIR
+from app.config import GEE_DOWNLOAD_WORKERS, GEE_SERVICE_ACCOUNT_PATH, project_export_dir
+from app.services.job_cache import TTLCache
 
 
 # Sentinel-2 L2A band specifications
@@ -29,6 +36,63 @@ SENTINEL2_BANDS = {
 # Default bands for export (all bands)
 DEFAULT_BANDS = ['B2', 'B3', 'B4', 'B5', 'B6', 'B7', 'B8', 'B8A', 'B11', 'B12']
 
+# GDAL COG driver options for exported chips. 256x256 internal tiles match
+# the training patch size, so a sampler window decodes a single tile.
+COG_OPTIONS = {
+    'BLOCKSIZE': 256,
+    'COMPRESS': 'DEFLATE',
+    'PREDICTOR': 'YES',
+    'OVERVIEWS': 'AUTO',
+}
+
+# Bytes read per iteration when streaming downloads to disk
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Image counts per (geometry hash, start date, end date, cloud cover max);
+# the archive changes slowly, so an hour-old count is good enough
+IMAGE_INFO_CACHE_TTL = 60 * 60
+image_info_cache = TTLCache(ttl=IMAGE_INFO_CACHE_TTL)
+
+
+def _create_session() -> requests.Session:
+    """
+    Build the HTTP session shared by all imagery downloads.
+
+    Keep-alive connections to Earth Engine's download host are reused
+    across chips and tiles instead of paying a TCP and TLS handshake per
+    request. The pool is sized for the concurrent tile downloads, and
+    transient server errors are retried with backoff.
+    """
+    session = requests.Session()
+    retries = Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=('GET',),
+    )
+    adapter = HTTPAdapter(
+        pool_connections=16,
+        pool_maxsize=max(16, GEE_DOWNLOAD_WORKERS),
+        max_retries=retries,
+    )
+    session.mount('https://', adapter)
+    return session
+
+
+_session = _create_session()
+
+
+def write_cog(src_path: str, dst_path: str) -> None:
+    """
+    Rewrite a GeoTIFF as a Cloud-Optimized GeoTIFF.
+
+    The result is written next to dst_path and renamed into place, so readers
+    never see a partially written file.
+    """
+    tmp_path = f'{dst_path}.cog.tmp'
+    rasterio.shutil.copy(src_path, tmp_path, driver='COG', **COG_OPTIONS)
+    os.replace(tmp_path, dst_path)
+
 
 class GEEService:
     """Service for Google Earth Engine operations."""
@@ -62,11 +126,15 @@ class GEEService:
 
         credentials = ee.ServiceAccountCredentials(
             email=service_account_info.get('client_email'),
-            key_file=GEE_SERVICE_ACCOUNT_PATH
+            key_file=str(GEE_SERVICE_ACCOUNT_PATH)
         )
         ee.Initialize(credentials)
 
-    def _mask_clouds_qa60(self, image: ee.Image) -> ee.Image:
+        # Composites built before (re)initialization belong to the old session
+        _get_base_composite.cache_clear()
+
+    @staticmethod
+    def _mask_clouds_qa60(image: ee.Image) -> ee.Image:
         """Apply cloud masking using QA60 bitmask."""
         qa = image.select('QA60')
         # Bits 10 and 11 are clouds and cirrus
@@ -88,6 +156,10 @@ class GEEService:
         """
         Get cloud-masked Sentinel-2 L2A median composite.
 
+        The composite is shared by every geometry with the same dates, bands
+        and cloud cover filter and only the clip differs, so Earth Engine
+        sees one computation graph across all chips and tiles of a job.
+
         Args:
             geometry: GeoJSON geometry for the chip
             start_date: Start date (YYYY-MM-DD)
@@ -98,23 +170,10 @@ class GEEService:
         Returns:
             ee.Image: Median composite image
         """
-        # Convert GeoJSON to EE geometry
-        ee_geometry = ee.Geometry(geometry)
-
-        # Get Sentinel-2 L2A collection (harmonized for consistent processing)
-        collection = (
-            ee.ImageCollection('COPERNICUS/S2_SR_HARMONIZED')
-            .filterBounds(ee_geometry)
-            .filterDate(start_date, end_date)
-            .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', cloud_cover_max))
-            .map(self._mask_clouds_qa60)
-        )
-
-        # Create median composite and select requested bands
-        composite = collection.median().select(bands)
+        composite = _get_base_composite(start_date, end_date, tuple(bands), cloud_cover_max)
 
         # Clip to geometry
-        return composite.clip(ee_geometry)
+        return composite.clip(ee.Geometry(geometry))
 
     def download_chip(
         self,
@@ -125,7 +184,8 @@ class GEEService:
         end_date: str,
         bands: Optional[List[str]] = None,
         cloud_cover_max: int = 20,
-        scale: int = 10
+        scale: int = 10,
+        out_path: Optional[Path] = None
     ) -> str:
         """
         Download chip imagery directly to local file.
@@ -139,6 +199,8 @@ class GEEService:
             bands: List of band names (defaults to all bands)
             cloud_cover_max: Max cloud cover percentage
             scale: Output resolution in meters
+            out_path: Where to save the GeoTIFF (defaults to the project's
+                exports directory)
 
         Returns:
             str: Local file path where GeoTIFF was saved
@@ -151,33 +213,109 @@ class GEEService:
             geometry, start_date, end_date, bands, cloud_cover_max
         )
 
-        # Convert geometry to EE geometry for download region
-        ee_geometry = ee.Geometry(geometry)
+        if out_path is None:
+            # Create export directory
+            export_dir = project_export_dir(project_id)
+            export_dir.mkdir(parents=True, exist_ok=True)
+            local_path = export_dir / f'{chip_id}.tif'
+        else:
+            local_path = out_path
+        self._download_image(
+            image, chip_id, bands, ee.Geometry(geometry), scale, local_path
+        )
+
+        return str(local_path)
+
+    def download_region(
+        self,
+        bounds: Dict[str, float],
+        output_path: Path,
+        start_date: str,
+        end_date: str,
+        bands: Optional[List[str]] = None,
+        cloud_cover_max: int = 20,
+        scale: int = 10
+    ) -> str:
+        """
+        Download imagery for a whole bounding box in a single request.
+
+        One composite and one transfer replace a request per tile; callers
+        cut tiles out locally with windowed reads. Earth Engine rejects
+        requests above its download size limit, so large regions raise and
+        must be fetched tile by tile instead.
+
+        Args:
+            bounds: Dict with 'west', 'south', 'east', 'north' in degrees
+            output_path: Where to write the GeoTIFF
+            start_date: Start date (YYYY-MM-DD)
+            end_date: End date (YYYY-MM-DD)
+            bands: List of band names (defaults to all bands)
+            cloud_cover_max: Max cloud cover percentage
+            scale: Output resolution in meters
+
+        Returns:
+            str: Local file path where GeoTIFF was saved
+        """
+        if bands is None:
+            bands = DEFAULT_BANDS
+
+        west, south, east, north = bounds['west'], bounds['south'], bounds['east'], bounds['north']
+        geometry = {
+            'type': 'Polygon',
+            'coordinates': [[
+                [west, south], [east, south], [east, north], [west, north], [west, south],
+            ]]
+        }
+        image = self.get_sentinel2_composite(
+            geometry, start_date, end_date, bands, cloud_cover_max
+        )
+
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        self._download_image(
+            image, output_path.stem, bands, ee.Geometry(geometry), scale, output_path
+        )
+
+        return str(output_path)
 
-        # Get download URL
+    def _download_image(
+        self,
+        image: ee.Image,
+        name: str,
+        bands: List[str],
+        region: ee.Geometry,
+        scale: int,
+        local_path: Path
+    ) -> None:
+        """Download an image as GeoTIFF and store it as a COG at local_path."""
         url = image.getDownloadURL({
-            'name': chip_id,
+            'name': name,
             'bands': bands,
-            'region': ee_geometry,
+            'region': region,
             'scale': scale,
             'format': 'GEO_TIFF',
             'crs': 'EPSG:4326'
         })
 
-        # Create export directory
-        export_dir = Path(EXPORTS_DIR) / str(project_id)
-        export_dir.mkdir(parents=True, exist_ok=True)
-
-        # Download file
-        local_path = export_dir / f'{chip_id}.tif'
-        response = requests.get(url, stream=True, timeout=300)
-        response.raise_for_status()
-
-        with open(local_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
-
-        return str(local_path)
+        # Download to a temporary file, then convert to COG in place
+        download_path = local_path.with_name(f'{local_path.name}.download')
+        try:
+            # Closing the response returns its connection to the pool
+            with _session.get(url, stream=True, timeout=300) as response:
+                response.raise_for_status()
+                # Write chunks straight to the descriptor; a buffered file
+                # would only copy each 1 MiB chunk once more
+                fd = os.open(download_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+                try:
+                    for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        view = memoryview(chunk)
+                        while view:
+                            view = view[os.write(fd, view):]
+                finally:
+                    os.close(fd)
+
+            write_cog(str(download_path), str(local_path))
+        finally:
+            download_path.unlink(missing_ok=True)
 
     def get_image_info(
         self,
@@ -189,6 +327,9 @@ class GEEService:
         """
         Get information about available imagery for a region.
 
+        Image counts are cached for an hour, so repeat queries skip the
+        Earth Engine round trip.
+
         Args:
             geometry: GeoJSON geometry
             start_date: Start date (YYYY-MM-DD)
@@ -198,16 +339,7 @@ class GEEService:
         Returns:
             Dict with image count and date range info
         """
-        ee_geometry = ee.Geometry(geometry)
-
-        collection = (
-            ee.ImageCollection('COPERNICUS/S2_SR_HARMONIZED')
-            .filterBounds(ee_geometry)
-            .filterDate(start_date, end_date)
-            .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', cloud_cover_max))
-        )
-
-        count = collection.size().getInfo()
+        count = self.get_image_counts([geometry], start_date, end_date, cloud_cover_max)[0]
 
         return {
             'imageCount': count,
@@ -216,6 +348,79 @@ class GEEService:
             'cloudCoverMax': cloud_cover_max
         }
 
+    def get_image_counts(
+        self,
+        geometries: List[Dict],
+        start_date: str,
+        end_date: str,
+        cloud_cover_max: int = 20
+    ) -> List[int]:
+        """
+        Count available images for several regions in one request.
+
+        Uncached regions are counted server-side in a single ee.List, so N
+        regions cost one Earth Engine round trip instead of N.
+
+        Args:
+            geometries: GeoJSON geometries
+            start_date: Start date (YYYY-MM-DD)
+            end_date: End date (YYYY-MM-DD)
+            cloud_cover_max: Max cloud cover percentage
+
+        Returns:
+            Image count for each geometry, in order
+        """
+        keys = [
+            (_geometry_key(geometry), start_date, end_date, cloud_cover_max)
+            for geometry in geometries
+        ]
+        counts = [image_info_cache.get(key) for key in keys]
+
+        missing = [i for i, count in enumerate(counts) if count is None]
+        if missing:
+            sizes = ee.List([
+                ee.ImageCollection('COPERNICUS/S2_SR_HARMONIZED')
+                .filterBounds(ee.Geometry(geometries[i]))
+                .filterDate(start_date, end_date)
+                .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', cloud_cover_max))
+                .size()
+                for i in missing
+            ]).getInfo()
+
+            for i, count in zip(missing, sizes):
+                image_info_cache.set(keys[i], count)
+                counts[i] = count
+
+        return counts
+
+
+@lru_cache(maxsize=32)
+def _get_base_composite(
+    start_date: str,
+    end_date: str,
+    bands: Tuple[str, ...],
+    cloud_cover_max: int
+) -> ee.Image:
+    """Build the unclipped median composite for a date range and filter."""
+    # Get Sentinel-2 L2A collection (harmonized for consistent processing).
+    # No filterBounds: the clip limits computation to each geometry, and a
+    # geometry-free graph is identical for every chip.
+    collection = (
+        ee.ImageCollection('COPERNICUS/S2_SR_HARMONIZED')
+        .filterDate(start_date, end_date)
+        .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', cloud_cover_max))
+        .map(GEEService._mask_clouds_qa60)
+    )
+
+    # Create median composite and select requested bands
+    return collection.median().select(list(bands))
+
+
+def _geometry_key(geometry: Dict) -> str:
+    """Stable hash of a GeoJSON geometry for cache keys."""
+    encoded = orjson.dumps(geometry, option=orjson.OPT_SORT_KEYS)
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
 
 # Module-level function for getting the singleton instance
 def get_gee_service() -> GEEService:
@@ -2,6 +2,9 @@
 Service for reading and converting exported GeoTIFF imagery.
 """
 import io
+import os
+import threading
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional
 
@@ -9,7 +12,7 @@ import numpy as np
 import rasterio
 from PIL import Image
 
-from app.config import EXPORTS_DIR
+from app.config import project_export_dir
 
 
 # Band indices in the exported GeoTIFF (1-indexed for rasterio)
@@ -39,12 +42,25 @@ def get_chip_geotiff_path(project_id: int, chip_id: str) -> Optional[Path]:
     Returns:
         Path to GeoTIFF file, or None if not exported
     """
-    path = Path(EXPORTS_DIR) / str(project_id) / f'{chip_id}.tif'
+    path = project_export_dir(project_id) / f'{chip_id}.tif'
     if path.exists():
         return path
     return None
 
 
+def _gamma_scale(values: np.ndarray, max_value: int) -> np.ndarray:
+    """Scale reflectances to 0-255 with gamma correction."""
+    values = np.clip(values, 0, max_value)
+    values = (values / max_value) ** (1 / 1.4)  # gamma = 1.4
+    return (values * 255).astype(np.uint8)
+
+
+@lru_cache(maxsize=8)
+def _gamma_lut(max_value: int) -> np.ndarray:
+    """Lookup table of _gamma_scale for every uint16 value."""
+    return _gamma_scale(np.arange(65536, dtype=np.float32), max_value)
+
+
 def geotiff_to_rgb_png(geotiff_path: Path, max_value: int = 3000) -> bytes:
     """
     Convert a multi-band GeoTIFF to RGB PNG bytes.
@@ -57,18 +73,17 @@ def geotiff_to_rgb_png(geotiff_path: Path, max_value: int = 3000) -> bytes:
         PNG image as bytes
     """
     with rasterio.open(geotiff_path) as src:
-        # Read RGB bands (B4=Red, B3=Green, B2=Blue)
-        red = src.read(BAND_INDICES['B4'])
-        green = src.read(BAND_INDICES['B3'])
-        blue = src.read(BAND_INDICES['B2'])
+        # Read RGB bands (B4=Red, B3=Green, B2=Blue) in one pass
+        bands = src.read((BAND_INDICES['B4'], BAND_INDICES['B3'], BAND_INDICES['B2']))
 
-    # Stack into RGB array (height, width, 3)
-    rgb = np.stack([red, green, blue], axis=-1).astype(np.float32)
+    # (height, width, 3) view; indexing with it yields a contiguous array
+    bands = bands.transpose(1, 2, 0)
 
-    # Scale to 0-255 range with gamma correction
-    rgb = np.clip(rgb, 0, max_value)
-    rgb = (rgb / max_value) ** (1 / 1.4)  # gamma = 1.4
-    rgb = (rgb * 255).astype(np.uint8)
+    if bands.dtype in (np.uint8, np.uint16):
+        # Integer reflectances map through a precomputed lookup table
+        rgb = _gamma_lut(max_value)[bands]
+    else:
+        rgb = _gamma_scale(bands.astype(np.float32), max_value)
 
     # Create PIL image
     image = Image.fromarray(rgb, mode='RGB')
@@ -99,6 +114,50 @@ def get_chip_thumbnail(project_id: int, chip_id: str) -> Optional[bytes]:
     return geotiff_to_rgb_png(geotiff_path)
 
 
+def get_chip_thumbnail_path(project_id: int, chip_id: str) -> Optional[Path]:
+    """
+    Get the path to a chip's cached RGB thumbnail PNG, rendering it if needed.
+
+    Thumbnails are written next to the exports under a ``thumbnails``
+    directory and re-rendered only when the GeoTIFF is newer than the cache.
+
+    Args:
+        project_id: Project ID
+        chip_id: Chip ID
+
+    Returns:
+        Path to the PNG file, or None if chip hasn't been exported
+    """
+    geotiff_path = get_chip_geotiff_path(project_id, chip_id)
+    if geotiff_path is None:
+        return None
+
+    thumbnail_path = project_export_dir(project_id) / 'thumbnails' / f'{chip_id}.png'
+    try:
+        if thumbnail_path.stat().st_mtime_ns >= geotiff_path.stat().st_mtime_ns:
+            return thumbnail_path
+    except FileNotFoundError:
+        pass
+
+    png_bytes = geotiff_to_rgb_png(geotiff_path)
+
+    # Write to a unique temp file and rename so readers never see a partial PNG
+    thumbnail_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = thumbnail_path.with_name(
+        f'{thumbnail_path.name}.{os.getpid()}.{threading.get_ident()}.tmp'
+    )
+    tmp_path.write_bytes(png_bytes)
+    os.replace(tmp_path, thumbnail_path)
+
+    from app.database import get_db, set_chip_asset
+
+    db = get_db()
+    set_chip_asset(db, chip_id, 'thumbnail')
+    db.commit()
+
+    return thumbnail_path
+
+
 def get_chip_metadata(project_id: int, chip_id: str) -> Optional[dict]:
     """
     Get metadata from an exported chip's GeoTIFF.
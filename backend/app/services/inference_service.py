@@ -1,18 +1,25 @@
 """Inference service for running model predictions on regions."""
 
 import json
+import math
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from itertools import islice
 from pathlib import Path
-from typing import Callable, Dict, List, Optional, Tuple
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 import numpy as np
 import rasterio
 import torch
 from PIL import Image
+from rasterio.enums import Resampling
 from rasterio.transform import from_bounds
+from rasterio.windows import from_bounds as window_from_bounds
 from torchgeo.trainers import SemanticSegmentationTask
 
-from app.config import EXPORTS_DIR, INFERENCE_DIR, MODELS_DIR
+from app.config import GEE_DOWNLOAD_WORKERS, INFERENCE_DIR, MODELS_DIR
 from app.services.gee_service import DEFAULT_BANDS, get_gee_service
 
 
@@ -21,6 +28,55 @@ TILE_SIZE = 256  # pixels
 TILE_OVERLAP = 0.5  # 50% overlap
 TILE_STRIDE = int(TILE_SIZE * (1 - TILE_OVERLAP))  # 128 pixel stride
 
+# Overview levels built into saved probability GeoTIFFs
+PROBABILITY_OVERVIEWS = [2, 4, 8, 16]
+
+# Overlay PNG palette indexed by probability * 255: red rises and blue falls
+# (as in probability_to_rgb), every entry at 50% opacity
+_overlay_red = np.arange(256, dtype=np.uint8)
+OVERLAY_PALETTE = np.stack(
+    [_overlay_red, np.zeros(256, dtype=np.uint8), 255 - _overlay_red], axis=1
+).tobytes()
+OVERLAY_TRANSPARENCY = bytes([128]) * 256
+
+# zlib level for overlay PNGs; the default (6) is several times slower for
+# little size gain
+OVERLAY_PNG_COMPRESS_LEVEL = 1
+
+# Approximate length of one degree of latitude (and of longitude at the
+# equator) in meters
+METERS_PER_DEGREE = 111320
+
+# Tiles per model forward pass
+INFERENCE_BATCH_SIZE = 8
+
+# Loaded models kept in memory across inference jobs
+MODEL_CACHE_SIZE = 2
+
+# Per-batch progress is reported once it advances this many percentage
+# points or this many seconds pass; each report is a database write
+PROGRESS_REPORT_STEP = 1.0
+PROGRESS_REPORT_INTERVAL = 0.5
+
+# Run inference on the GPU when there is one
+INFERENCE_DEVICE = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+
+if INFERENCE_DEVICE.type == 'cuda':
+    # Tile shape is fixed, so cuDNN autotuning pays off after the first batch
+    torch.backends.cudnn.benchmark = True
+
+
+def meters_per_degree(lat: float) -> Tuple[float, float]:
+    """Approximate meters per degree of latitude and longitude at a latitude."""
+    return METERS_PER_DEGREE, METERS_PER_DEGREE * math.cos(math.radians(lat))
+
+
+def _tile_count(extent: float, tile_size: float, stride: float) -> int:
+    """Number of tiles at the given stride needed to cover extent."""
+    if extent <= tile_size:
+        return 1
+    return int(np.ceil((extent - tile_size) / stride)) + 1
+
 
 def generate_tile_grid(
     bounds: Dict[str, float],
@@ -40,8 +96,7 @@ def generate_tile_grid(
     # Calculate approximate degrees per pixel at this latitude
     # At equator: 1 degree ≈ 111,320 meters
     avg_lat = (south + north) / 2
-    meters_per_deg_lat = 111320
-    meters_per_deg_lng = 111320 * np.cos(np.radians(avg_lat))
+    meters_per_deg_lat, meters_per_deg_lng = meters_per_degree(avg_lat)
 
     # Tile size in degrees
     tile_height_deg = (TILE_SIZE * resolution) / meters_per_deg_lat
@@ -51,59 +106,58 @@ def generate_tile_grid(
     stride_height_deg = tile_height_deg * (1 - TILE_OVERLAP)
     stride_width_deg = tile_width_deg * (1 - TILE_OVERLAP)
 
-    tiles = []
-    tile_idx = 0
-    y = south
-
-    while y < north:
-        x = west
-        while x < east:
-            # Tile bounds
-            tile_west = x
-            tile_south = y
-            tile_east = min(x + tile_width_deg, east + tile_width_deg)
-            tile_north = min(y + tile_height_deg, north + tile_height_deg)
-
-            tile_bounds = {
-                'west': tile_west,
-                'south': tile_south,
-                'east': tile_east,
-                'north': tile_north,
-            }
-
-            # Create GeoJSON polygon for GEE
-            geometry = {
-                'type': 'Polygon',
-                'coordinates': [[
-                    [tile_west, tile_south],
-                    [tile_east, tile_south],
-                    [tile_east, tile_north],
-                    [tile_west, tile_north],
-                    [tile_west, tile_south],
-                ]]
-            }
+    # Tiles start every stride; the last column and row are pulled back to
+    # end on the region edge so no tile overhangs it (a region smaller than
+    # one tile gets a single tile anchored at its south-west corner)
+    n_cols = _tile_count(east - west, tile_width_deg, stride_width_deg)
+    n_rows = _tile_count(north - south, tile_height_deg, stride_height_deg)
+    xs = np.minimum(
+        west + np.arange(n_cols) * stride_width_deg, max(east - tile_width_deg, west)
+    )
+    ys = np.minimum(
+        south + np.arange(n_rows) * stride_height_deg, max(north - tile_height_deg, south)
+    )
+    tile_wests = xs.tolist()
+    tile_easts = (xs + tile_width_deg).tolist()
+    tile_souths = ys.tolist()
+    tile_norths = (ys + tile_height_deg).tolist()
 
+    tiles = []
+    for row, (tile_south, tile_north) in enumerate(zip(tile_souths, tile_norths)):
+        for col, (tile_west, tile_east) in enumerate(zip(tile_wests, tile_easts)):
             tiles.append({
-                'id': f'tile_{tile_idx}',
-                'bounds': tile_bounds,
-                'geometry': geometry,
-                'col': int((x - west) / stride_width_deg),
-                'row': int((y - south) / stride_height_deg),
+                'id': f'tile_{len(tiles)}',
+                'bounds': {
+                    'west': tile_west,
+                    'south': tile_south,
+                    'east': tile_east,
+                    'north': tile_north,
+                },
+                # GeoJSON polygon for GEE
+                'geometry': {
+                    'type': 'Polygon',
+                    'coordinates': [[
+                        [tile_west, tile_south],
+                        [tile_east, tile_south],
+                        [tile_east, tile_north],
+                        [tile_west, tile_north],
+                        [tile_west, tile_south],
+                    ]]
+                },
+                'col': col,
+                'row': row,
             })
 
-            tile_idx += 1
-            x += stride_width_deg
-
-        y += stride_height_deg
-
     return tiles
 
 
+@lru_cache(maxsize=8)
 def create_blend_weights(size: int = TILE_SIZE) -> np.ndarray:
     """Create distance-weighted blending weights for a tile.
 
     Weights are highest in center and fall off towards edges using
-    a cosine window function for smooth blending.
+    a cosine window function for smooth blending. Cached per size, so the
+    returned array is read-only.
 
     Args:
         size: Tile size in pixels
@@ -116,9 +170,32 @@ def create_blend_weights(size: int = TILE_SIZE) -> np.ndarray:
     window_1d = np.sin(x)  # 0 at edges, 1 at center
 
     # Create 2D window by outer product
-    weights = np.outer(window_1d, window_1d)
+    weights = np.outer(window_1d, window_1d).astype(np.float32)
+    weights.setflags(write=False)
+
+    return weights
+
+
+def resize_bilinear(array: np.ndarray, height: int, width: int) -> np.ndarray:
+    """Resize a 2D float32 array with bilinear interpolation."""
+    return np.asarray(
+        Image.fromarray(array).resize((width, height), Image.BILINEAR)
+    )
 
-    return weights.astype(np.float32)
+
+@lru_cache(maxsize=64)
+def resized_blend_weights(height: int, width: int) -> np.ndarray:
+    """Blend weights for a TILE_SIZE tile resized to (height, width).
+
+    Cached, so the returned array is read-only.
+    """
+    weights = create_blend_weights(TILE_SIZE)
+    if weights.shape == (height, width):
+        return weights
+
+    weights = resize_bilinear(weights, height, width)
+    weights.setflags(write=False)
+    return weights
 
 
 def load_model(checkpoint_path: str) -> SemanticSegmentationTask:
@@ -132,49 +209,243 @@ def load_model(checkpoint_path: str) -> SemanticSegmentationTask:
     """
     task = SemanticSegmentationTask.load_from_checkpoint(
         checkpoint_path,
-        map_location='cpu',
+        map_location=INFERENCE_DEVICE,
     )
+    task.to(INFERENCE_DEVICE)
     task.eval()
+    compile_model(task)
     return task
 
 
+def get_model(checkpoint_path: str) -> SemanticSegmentationTask:
+    """Get a loaded, compiled model, reusing it across inference jobs.
+
+    Cached by path and modification time, so a checkpoint rewritten in
+    place is loaded again.
+
+    Args:
+        checkpoint_path: Path to .ckpt file
+
+    Returns:
+        Loaded SemanticSegmentationTask model
+    """
+    return _load_model_cached(checkpoint_path, os.stat(checkpoint_path).st_mtime_ns)
+
+
+@lru_cache(maxsize=MODEL_CACHE_SIZE)
+def _load_model_cached(checkpoint_path: str, mtime_ns: int) -> SemanticSegmentationTask:
+    return load_model(checkpoint_path)
+
+
+def compile_model(task: SemanticSegmentationTask) -> None:
+    """Compile the task's network in place with torch.compile.
+
+    Compilation fuses conv/BN/activation kernels and removes per-layer
+    Python dispatch. It happens lazily on the first forward pass, so a
+    warm-up batch of the fixed inference shape is run here instead of on
+    the first real tiles. Falls back to eager mode if compilation fails.
+
+    Args:
+        task: Loaded model, already on INFERENCE_DEVICE in eval mode
+    """
+    eager_model = task.model
+    try:
+        task.model = torch.compile(eager_model)
+        warmup = torch.zeros(
+            (INFERENCE_BATCH_SIZE, task.hparams['in_channels'], TILE_SIZE, TILE_SIZE),
+            device=INFERENCE_DEVICE,
+        )
+        with torch.no_grad(), _autocast():
+            task(warmup)
+    except Exception as e:
+        print(f"Warning: torch.compile failed, running the model eagerly: {e}")
+        task.model = eager_model
+
+
+def _autocast() -> torch.autocast:
+    """Autocast context for inference: FP16 on CUDA, plain FP32 on CPU."""
+    if INFERENCE_DEVICE.type == 'cuda':
+        return torch.autocast(device_type='cuda', dtype=torch.float16)
+    # CPU stays in FP32; reduced precision is rarely faster there
+    return torch.autocast(device_type='cpu', enabled=False)
+
+
+def read_tile_image(tile: Dict, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """Read all bands for a tile, resampled to TILE_SIZE x TILE_SIZE.
+
+    Tiles cut from a region download are read as a window of the region
+    GeoTIFF; tiles downloaded on their own are read whole. Equal shapes let
+    tiles be stacked into batches.
+
+    Args:
+        tile: Tile dictionary with either 'region_path' or 'local_path'
+        out: Optional array of shape (bands, TILE_SIZE, TILE_SIZE) to read
+            into; GDAL converts to its dtype while reading
+
+    Returns:
+        Array of shape (bands, TILE_SIZE, TILE_SIZE), out if given
+    """
+    path = tile.get('region_path') or tile['local_path']
+    with rasterio.open(path) as src:
+        if out is None:
+            target = {'out_shape': (src.count, TILE_SIZE, TILE_SIZE)}
+        else:
+            target = {'out': out}
+
+        if 'region_path' in tile:
+            b = tile['bounds']
+            window = window_from_bounds(
+                b['west'], b['south'], b['east'], b['north'], transform=src.transform
+            )
+            return src.read(
+                window=window,
+                resampling=Resampling.bilinear,
+                boundless=True,
+                fill_value=0,
+                **target,
+            )
+
+        return src.read(resampling=Resampling.bilinear, **target)
+
+
+def run_inference_on_batch(
+    model: SemanticSegmentationTask,
+    images: np.ndarray,
+    out: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Run inference on a batch of tiles in one forward pass.
+
+    Args:
+        model: Loaded model
+        images: float32 array of shape (batch, bands, height, width)
+        out: Optional float32 array of shape (n, height, width), n <= batch,
+            that receives the probabilities for the first n images
+
+    Returns:
+        Array of probabilities (0-1), shape (batch, height, width), or out
+    """
+    image_tensor = torch.from_numpy(images)
+
+    if INFERENCE_DEVICE.type == 'cuda':
+        # Copy from pinned memory asynchronously (pin_memory() is a no-op for
+        # buffers from _allocate_batch); the forward pass then runs in FP16
+        # on tensor cores
+        image_tensor = image_tensor.pin_memory().to(INFERENCE_DEVICE, non_blocking=True)
+
+    # Normalize (Sentinel-2 surface reflectance values) in place
+    image_tensor.div_(10000.0)
+
+    # Run inference
+    with torch.no_grad(), _autocast():
+        output = model(image_tensor)
+
+    # Get probabilities (sigmoid for binary segmentation), in place
+    probs = output[:, 0].float().sigmoid_()
+    if out is None:
+        return probs.cpu().numpy()
+
+    # Copy straight into the caller's buffer, without an intermediate array
+    torch.from_numpy(out).copy_(probs[:len(out)])
+    return out
+
+
 def run_inference_on_tile(
     model: SemanticSegmentationTask,
-    tile_path: str,
+    image: np.ndarray,
 ) -> np.ndarray:
     """Run inference on a single tile.
 
     Args:
         model: Loaded model
-        tile_path: Path to GeoTIFF file
+        image: Tile bands, shape (bands, height, width)
 
     Returns:
         2D numpy array of probabilities (0-1)
     """
-    with rasterio.open(tile_path) as src:
-        # Read all bands
-        image = src.read()  # Shape: (bands, height, width)
+    return run_inference_on_batch(model, image[np.newaxis].astype(np.float32))[0]
 
-    # Convert to tensor
-    image_tensor = torch.from_numpy(image.astype(np.float32))
-    image_tensor = image_tensor.unsqueeze(0)  # Add batch dimension
 
-    # Normalize (Sentinel-2 surface reflectance values)
-    image_tensor = image_tensor / 10000.0
+def _allocate_batch(shape: Tuple[int, ...]) -> np.ndarray:
+    """Allocate a zeroed float32 batch buffer.
 
-    # Run inference
-    with torch.no_grad():
-        output = model(image_tensor)
+    On CUDA the buffer lives in pinned host memory, so every batch copies
+    to the GPU asynchronously without staging through a fresh pinned
+    allocation.
+    """
+    return torch.zeros(
+        shape, dtype=torch.float32, pin_memory=INFERENCE_DEVICE.type == 'cuda'
+    ).numpy()
+
+
+def predict_tiles(
+    model: SemanticSegmentationTask,
+    tiles: Iterable[Dict],
+    out: np.ndarray,
+    batch_size: int = INFERENCE_BATCH_SIZE,
+) -> Iterator[Tuple[slice, np.ndarray]]:
+    """Run inference over tiles in batches.
 
-    # Get probabilities (sigmoid for binary segmentation)
-    probs = torch.sigmoid(output).squeeze().numpy()
+    Each batch is read into a reused float32 buffer and run through
+    the model in a single forward pass. Probabilities for the i-th tile
+    are written to out[i]. tiles may be a generator yielding tiles as
+    they download; each batch runs as soon as it is full.
 
-    return probs
+    Args:
+        model: Loaded model
+        tiles: Tiles to predict
+        out: float32 array with at least one (TILE_SIZE, TILE_SIZE) row
+            per tile
+        batch_size: Tiles per forward pass
+
+    Yields:
+        (tile_slice, ok) per batch. ok is a boolean array with one entry
+        per tile in the slice, False for tiles that couldn't be read or
+        whose batch failed, so callers can skip those tiles and carry on.
+    """
+    batch = None
+    tile_iter = iter(tiles)
+    start = 0
+    while batch_tiles := list(islice(tile_iter, batch_size)):
+        tile_slice = slice(start, start + len(batch_tiles))
+        start = tile_slice.stop
+
+        # A tile that can't be read only loses itself, not its batch
+        ok = np.zeros(len(batch_tiles), dtype=bool)
+        for i, tile in enumerate(batch_tiles):
+            try:
+                if batch is None:
+                    image = read_tile_image(tile)
+                    batch = _allocate_batch((batch_size, *image.shape))
+                    batch[i] = image
+                else:
+                    # Read straight into the batch as float32, with no
+                    # intermediate array or astype copy
+                    read_tile_image(tile, out=batch[i])
+                ok[i] = True
+            except Exception as e:
+                print(f"Warning: Failed to read tile {tile['id']}: {e}")
+                # Rows of a freshly allocated batch are already zero
+                if batch is not None:
+                    batch[i] = 0
+
+        if ok.any():
+            try:
+                # Always run the full buffer so the compiled model sees one
+                # shape; rows past the last tile are stale and dropped. The
+                # in-place normalization is fine since every row used is
+                # overwritten before it is read again.
+                run_inference_on_batch(model, batch, out=out[tile_slice])
+            except Exception as e:
+                tile_ids = ', '.join(tile['id'] for tile in batch_tiles)
+                print(f"Warning: Failed inference on tiles {tile_ids}: {e}")
+                ok[:] = False
+        yield tile_slice, ok
 
 
 def blend_tiles(
     tiles: List[Dict],
-    predictions: Dict[str, np.ndarray],
+    predictions: np.ndarray,
+    valid: np.ndarray,
     output_bounds: Dict[str, float],
     resolution: float = 10.0,
 ) -> Tuple[np.ndarray, Dict]:
@@ -182,7 +453,8 @@ def blend_tiles(
 
     Args:
         tiles: List of tile dictionaries
-        predictions: Dict mapping tile_id to probability array
+        predictions: Probability arrays, predictions[i] for tiles[i]
+        valid: Boolean array, False for tiles without a prediction
         output_bounds: Full region bounds
         resolution: Pixel resolution in meters
 
@@ -198,8 +470,7 @@ def blend_tiles(
 
     # Calculate output dimensions
     avg_lat = (south + north) / 2
-    meters_per_deg_lat = 111320
-    meters_per_deg_lng = 111320 * np.cos(np.radians(avg_lat))
+    meters_per_deg_lat, meters_per_deg_lng = meters_per_degree(avg_lat)
 
     height_deg = north - south
     width_deg = east - west
@@ -210,19 +481,19 @@ def blend_tiles(
     output_height = int(np.ceil(height_m / resolution))
     output_width = int(np.ceil(width_m / resolution))
 
-    # Create output arrays for weighted accumulation
-    prob_sum = np.zeros((output_height, output_width), dtype=np.float64)
-    weight_sum = np.zeros((output_height, output_width), dtype=np.float64)
+    # Create output arrays for weighted accumulation. float32 halves the
+    # memory traffic of this bandwidth-bound loop; the sums of a few
+    # overlapping tiles in [0, 1] need nowhere near float64 precision.
+    prob_sum = np.zeros((output_height, output_width), dtype=np.float32)
+    weight_sum = np.zeros((output_height, output_width), dtype=np.float32)
 
-    # Create blend weights
-    blend_weights = create_blend_weights(TILE_SIZE)
+    # Reused for pred * weights so the loop allocates no temporaries
+    scratch = np.empty((TILE_SIZE, TILE_SIZE), dtype=np.float32)
 
-    for tile in tiles:
-        tile_id = tile['id']
-        if tile_id not in predictions:
+    for tile, pred, ok in zip(tiles, predictions, valid):
+        if not ok:
             continue
 
-        pred = predictions[tile_id]
         tile_bounds = tile['bounds']
 
         # Calculate pixel coordinates for this tile in output
@@ -250,24 +521,30 @@ def blend_tiles(
         if out_height <= 0 or out_width <= 0:
             continue
 
-        # Resize prediction and weights to match output area
-        from PIL import Image as PILImage
-        pred_resized = np.array(
-            PILImage.fromarray(pred).resize((out_width, out_height), PILImage.BILINEAR)
-        )
-        weights_resized = np.array(
-            PILImage.fromarray(blend_weights).resize((out_width, out_height), PILImage.BILINEAR)
-        )
+        # Resize prediction and weights to match output area. Most tiles
+        # share a few output sizes, so resized weights are cached.
+        if pred.shape == (out_height, out_width):
+            pred_resized = pred
+        else:
+            pred_resized = resize_bilinear(pred, out_height, out_width)
+        weights_resized = resized_blend_weights(out_height, out_width)
 
         # Accumulate weighted predictions
-        prob_sum[row_start:row_end, col_start:col_end] += pred_resized * weights_resized
+        if scratch.shape[0] < out_height or scratch.shape[1] < out_width:
+            scratch = np.empty(
+                (max(scratch.shape[0], out_height), max(scratch.shape[1], out_width)),
+                dtype=np.float32,
+            )
+        weighted = scratch[:out_height, :out_width]
+        np.multiply(pred_resized, weights_resized, out=weighted)
+        prob_sum[row_start:row_end, col_start:col_end] += weighted
         weight_sum[row_start:row_end, col_start:col_end] += weights_resized
 
     # Avoid division by zero
-    weight_sum = np.maximum(weight_sum, 1e-10)
+    np.maximum(weight_sum, 1e-10, out=weight_sum)
 
-    # Compute final blended probability map
-    probability_map = (prob_sum / weight_sum).astype(np.float32)
+    # Compute final blended probability map in place
+    probability_map = np.divide(prob_sum, weight_sum, out=prob_sum)
 
     # Create rasterio profile
     transform = from_bounds(west, south, east, north, output_width, output_height)
@@ -280,6 +557,14 @@ def blend_tiles(
         'crs': 'EPSG:4326',
         'transform': transform,
         'compress': 'lzw',
+        # Floating-point predictor roughly halves the LZW output for
+        # smooth probability surfaces
+        'predictor': 3,
+        # Tiled layout keeps windowed reads proportional to the window
+        'tiled': True,
+        'blockxsize': 256,
+        'blockysize': 256,
+        'BIGTIFF': 'IF_SAFER',
     }
 
     return probability_map, profile
@@ -294,27 +579,14 @@ def probability_to_rgb(probability: np.ndarray) -> np.ndarray:
     Returns:
         3D array (height, width, 4) with RGBA values
     """
-    height, width = probability.shape
-
-    # Create RGBA output
-    rgba = np.zeros((height, width, 4), dtype=np.uint8)
-
-    # Blue (0%) → Purple (50%) → Red (100%)
-    # Blue: (0, 0, 255)
-    # Purple: (128, 0, 128)
-    # Red: (255, 0, 0)
+    # Blue (0%) → Purple (50%) → Red (100%): red rises with the
+    # probability and blue falls, so both come from one scaled array
+    red = (np.clip(probability, 0, 1) * 255).astype(np.uint8)
 
-    # Interpolate colors
-    prob = np.clip(probability, 0, 1)
-
-    # Red channel: 0→128→255
-    rgba[:, :, 0] = (prob * 255).astype(np.uint8)
-
-    # Green channel: 0 throughout
+    rgba = np.empty((*red.shape, 4), dtype=np.uint8)
+    rgba[:, :, 0] = red
     rgba[:, :, 1] = 0
-
-    # Blue channel: 255→128→0
-    rgba[:, :, 2] = ((1 - prob) * 255).astype(np.uint8)
+    np.subtract(255, red, out=rgba[:, :, 2])
 
     # Alpha channel: 50% opacity (128)
     rgba[:, :, 3] = 128
@@ -342,6 +614,10 @@ def save_probability_geotiff(
     with rasterio.open(output_path, 'w', **profile) as dst:
         dst.write(probability, 1)
 
+        # Overviews let zoomed-out reads skip the full-resolution data
+        dst.build_overviews(PROBABILITY_OVERVIEWS, Resampling.average)
+        dst.update_tags(ns='rio_overview', resampling='average')
+
     return output_path
 
 
@@ -360,9 +636,17 @@ def save_overlay_png(
     """
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
-    rgba = probability_to_rgb(probability)
-    img = Image.fromarray(rgba, mode='RGBA')
-    img.save(output_path, 'PNG')
+    # The overlay has only 256 colors, so store one palette index per pixel
+    # instead of four RGBA bytes; decoded pixels match probability_to_rgb
+    index = (np.clip(probability, 0, 1) * 255).astype(np.uint8)
+    img = Image.fromarray(index, mode='P')
+    img.putpalette(OVERLAY_PALETTE)
+    img.save(
+        output_path,
+        'PNG',
+        transparency=OVERLAY_TRANSPARENCY,
+        compress_level=OVERLAY_PNG_COMPRESS_LEVEL,
+    )
 
     return output_path
 
@@ -402,6 +686,67 @@ def get_inference_output_dir(project_id: int, job_id: int) -> Path:
     return Path(INFERENCE_DIR) / str(project_id) / str(job_id)
 
 
+def download_tile(project_id: int, tile: Dict, tiles_dir: Path) -> Path:
+    """Download a tile from GEE into the inference tiles directory.
+
+    Args:
+        project_id: Project ID
+        tile: Tile dictionary from generate_tile_grid
+        tiles_dir: Directory holding the job's tiles
+
+    Returns:
+        Path to the tile GeoTIFF
+    """
+    tile_path = tiles_dir / f"{tile['id']}.tif"
+
+    # Download if not already exists
+    if not tile_path.exists():
+        get_gee_service().download_chip(
+            chip_id=tile['id'],
+            project_id=project_id,
+            geometry=tile['geometry'],
+            start_date='2025-01-01',
+            end_date='2025-12-31',
+            bands=DEFAULT_BANDS,
+            cloud_cover_max=30,
+            scale=10,
+            out_path=tile_path,
+        )
+
+    return tile_path
+
+
+def download_tiles(
+    project_id: int,
+    tiles: List[Dict],
+    tiles_dir: Path,
+) -> Iterator[Dict]:
+    """Download tiles from GEE one request per tile.
+
+    Each download is a blocking HTTP request, so they run on a thread pool.
+    Tiles are yielded as they finish, so the caller can run inference on
+    them while the rest are still downloading.
+
+    Yields:
+        The tiles that downloaded, in completion order, with 'local_path' set
+    """
+    # Initialize Earth Engine here so the threads share a ready singleton
+    get_gee_service()
+    with ThreadPoolExecutor(max_workers=GEE_DOWNLOAD_WORKERS) as executor:
+        futures = {
+            executor.submit(download_tile, project_id, tile, tiles_dir): tile
+            for tile in tiles
+        }
+        for future in as_completed(futures):
+            tile = futures[future]
+            try:
+                tile['local_path'] = str(future.result())
+            except Exception as e:
+                print(f"Warning: Failed to download tile {tile['id']}: {e}")
+                continue
+            yield tile
+
+
 def run_inference(
     project_id: int,
     job_id: int,
@@ -432,73 +777,87 @@ def run_inference(
     if progress_callback:
         progress_callback(0, f'Generated {total_tiles} tiles for inference')
 
-    # Download tiles from GEE
-    gee = get_gee_service()
+    # Load the model while imagery downloads
+    model_loader = ThreadPoolExecutor(max_workers=1)
+    model_future = model_loader.submit(get_model, checkpoint_path)
+    model_loader.shutdown(wait=False)
+
+    # Download the whole region in one request and cut tiles out locally.
+    # Cover the tiles' union, which exceeds bounds only for a region
+    # smaller than one tile.
+    region_bounds = {
+        'west': bounds['west'],
+        'south': bounds['south'],
+        'east': max(tile['bounds']['east'] for tile in tiles),
+        'north': max(tile['bounds']['north'] for tile in tiles),
+    }
+    region_path = output_dir / 'region.tif'
+    try:
+        if not region_path.exists():
+            if progress_callback:
+                progress_callback(0, 'Downloading imagery for region')
+            get_gee_service().download_region(
+                region_bounds,
+                region_path,
+                start_date='2025-01-01',
+                end_date='2025-12-31',
+                bands=DEFAULT_BANDS,
+                cloud_cover_max=30,
+                scale=10,
+            )
+        for tile in tiles:
+            tile['region_path'] = str(region_path)
+        tile_source = tiles
+        progress_start = 50  # Imagery is in hand; 50-90% is inference
+    except Exception as e:
+        # Regions above Earth Engine's download size limit are fetched per
+        # tile, with inference running on tiles as they arrive
+        print(f"Warning: Region download failed, downloading tiles separately: {e}")
+        tile_source = download_tiles(project_id, tiles, tiles_dir)
+        progress_start = 0  # Downloads and inference share 0-90%
+
+    if progress_callback and not model_future.done():
+        progress_callback(progress_start, 'Loading model...')
+
+    model = model_future.result()
+
+    # Run inference on each tile. Predictions are written into one
+    # preallocated array, row i for downloaded_tiles[i].
     downloaded_tiles = []
 
-    for i, tile in enumerate(tiles):
-        if progress_callback:
-            pct = (i / total_tiles) * 50  # First 50% is downloading
-            progress_callback(pct, f'Downloading tile {i+1}/{total_tiles}')
-
-        try:
-            tile_path = tiles_dir / f"{tile['id']}.tif"
-
-            # Download if not already exists
-            if not tile_path.exists():
-                gee.download_chip(
-                    chip_id=tile['id'],
-                    project_id=project_id,
-                    geometry=tile['geometry'],
-                    start_date='2025-01-01',
-                    end_date='2025-12-31',
-                    bands=DEFAULT_BANDS,
-                    cloud_cover_max=30,
-                    scale=10,
-                )
-                # Move from exports to inference tiles dir
-                export_path = Path(EXPORTS_DIR) / str(project_id) / f"{tile['id']}.tif"
-                if export_path.exists():
-                    export_path.rename(tile_path)
-
-            tile['local_path'] = str(tile_path)
+    def track_downloaded(source: Iterable[Dict]) -> Iterator[Dict]:
+        for tile in source:
             downloaded_tiles.append(tile)
-
-        except Exception as e:
-            print(f"Warning: Failed to download tile {tile['id']}: {e}")
-            continue
+            yield tile
+
+    predictions = np.empty((total_tiles, TILE_SIZE, TILE_SIZE), dtype=np.float32)
+    valid = np.zeros(total_tiles, dtype=bool)
+    reported_pct = progress_start
+    reported_at = time.monotonic()
+    for tile_slice, ok in predict_tiles(model, track_downloaded(tile_source), predictions):
+        valid[tile_slice] = ok
+
+        done = tile_slice.stop
+        pct = progress_start + (done / total_tiles) * (90 - progress_start)
+        now = time.monotonic()
+        if progress_callback and (
+            pct - reported_pct >= PROGRESS_REPORT_STEP
+            or now - reported_at >= PROGRESS_REPORT_INTERVAL
+        ):
+            progress_callback(pct, f'Ran inference on {done}/{total_tiles} tiles')
+            reported_pct, reported_at = pct, now
 
     if not downloaded_tiles:
         raise ValueError("Failed to download any tiles")
 
-    # Load model
-    if progress_callback:
-        progress_callback(50, 'Loading model...')
-
-    model = load_model(checkpoint_path)
-
-    # Run inference on each tile
-    predictions = {}
-    for i, tile in enumerate(downloaded_tiles):
-        if progress_callback:
-            pct = 50 + (i / len(downloaded_tiles)) * 40  # 50-90% is inference
-            progress_callback(pct, f'Running inference on tile {i+1}/{len(downloaded_tiles)}')
-
-        try:
-            pred = run_inference_on_tile(model, tile['local_path'])
-            predictions[tile['id']] = pred
-        except Exception as e:
-            print(f"Warning: Failed inference on tile {tile['id']}: {e}")
-            continue
-
-    if not predictions:
+    if not valid.any():
         raise ValueError("Failed to run inference on any tiles")
 
     # Blend tiles
     if progress_callback:
         progress_callback(90, 'Blending tiles...')
 
-    probability_map, profile = blend_tiles(tiles, predictions, bounds)
+    probability_map, profile = blend_tiles(downloaded_tiles, predictions, valid, bounds)
 
     # Save outputs
     if progress_callback:
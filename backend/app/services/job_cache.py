@@ -0,0 +1,101 @@
+"""
+Short-lived in-process cache for the job lookups the frontend polls.
+
+The training and inference progress views poll "latest job" and "has trained
+model" every few seconds. Results are cached per project for a couple of
+seconds and dropped whenever a job for that project changes state.
+"""
+import threading
+import time
+from typing import Any, Callable, Hashable
+
+
+class TTLCache:
+    """Thread-safe mapping whose entries expire ``ttl`` seconds after being set."""
+
+    def __init__(self, ttl: float, maxsize: int = 1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: dict[Hashable, tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any:
+        """Return the cached value for key, or None on a miss or expiry."""
+        with self._lock:
+            entry = self._data.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+        return None
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Cache value for key."""
+        now = time.monotonic()
+        with self._lock:
+            if len(self._data) >= self.maxsize:
+                self._evict(now)
+            self._data[key] = (now + self.ttl, value)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Return the cached value for key, calling loader on a miss or expiry."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > now:
+                return entry[1]
+
+        # Load outside the lock so a slow query doesn't block other projects
+        value = loader()
+        self.set(key, value)
+        return value
+
+    def pop(self, key: Hashable) -> None:
+        """Drop the cached value for key, if any."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def pop_matching(self, match: Callable[[Hashable], bool]) -> None:
+        """Drop every cached value whose key satisfies match."""
+        with self._lock:
+            for key in [key for key in self._data if match(key)]:
+                del self._data[key]
+
+    def _evict(self, now: float) -> None:
+        """Drop expired entries, or everything if none have expired yet."""
+        expired = [key for key, (expires, _) in self._data.items() if expires <= now]
+        if expired:
+            for key in expired:
+                del self._data[key]
+        else:
+            self._data.clear()
+
+
+# Seconds a polled lookup may be served from cache
+JOB_CACHE_TTL = 2
+
+# Keyed by project_id
+latest_training_cache = TTLCache(ttl=JOB_CACHE_TTL)
+trained_model_cache = TTLCache(ttl=JOB_CACHE_TTL)
+latest_inference_cache = TTLCache(ttl=JOB_CACHE_TTL)
+
+# Completed inference jobs never change, so their overlay path and bounds
+# are kept much longer. Keyed by (project_id, job_id).
+COMPLETED_JOB_CACHE_TTL = 60 * 60
+completed_inference_cache = TTLCache(ttl=COMPLETED_JOB_CACHE_TTL, maxsize=2048)
+
+
+def invalidate_training(project_id: int) -> None:
+    """Drop cached training lookups after a training job changes."""
+    latest_training_cache.pop(project_id)
+    trained_model_cache.pop(project_id)
+
+
+def invalidate_inference(project_id: int) -> None:
+    """Drop cached inference lookups after an inference job changes."""
+    latest_inference_cache.pop(project_id)
+
+
+def invalidate_project(project_id: int) -> None:
+    """Drop everything cached for a project after it is deleted."""
+    invalidate_training(project_id)
+    invalidate_inference(project_id)
+    completed_inference_cache.pop_matching(lambda key: key[0] == project_id)
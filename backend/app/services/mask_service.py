@@ -2,29 +2,64 @@
 Service for generating and serving target masks for positive chips.
 Masks are saved as GeoTIFFs for ML training and converted to PNG for web display.
 """
-import io
-import json
+import hashlib
 import logging
+import os
+import shutil
+import struct
+import threading
+import time
+import warnings
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+from itertools import groupby
+from operator import itemgetter
 from pathlib import Path
-from typing import Optional, List
+from typing import Optional, List, Tuple
 
 import numpy as np
+import orjson
 import rasterio
+import rasterio.errors
+import shapely
 from rasterio.features import rasterize
-from shapely.geometry import shape
-from PIL import Image
+from rasterio.io import MemoryFile
 
-from app.config import MASKS_DIR, EXPORTS_DIR
+from app.config import MASK_WORKERS, mask_cache_dir, project_export_dir, project_mask_dir
 
 
 logger = logging.getLogger(__name__)
 
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# zlib level for mask PNGs; bit-packed masks compress well even at level 1
+MASK_PNG_COMPRESS_LEVEL = 1
+
+# Sample type of mask GeoTIFFs
+MASK_DTYPE = 'uint8'
+
+# GeoTIFF tag holding the hash of the labels a mask was generated from
+LABEL_HASH_TAG = 'LABEL_HASH'
+
+# Per-thread mask array reused by generate_mask
+_mask_buffers = threading.local()
+
+# Seconds between passes deleting cached masks no project links to
+MASK_CACHE_PRUNE_INTERVAL = 60 * 60
+_last_cache_prune = 0.0
+
+# Fewer chips than this are rasterized on the calling thread; starting a
+# pool costs more than it saves
+MASK_POOL_MIN_CHIPS = 4
+
 
 def get_chip_geotiff_path(project_id: int, chip_id: str) -> Optional[Path]:
     """
     Get the path to a chip's exported GeoTIFF if it exists.
     """
-    path = Path(EXPORTS_DIR) / str(project_id) / f'{chip_id}.tif'
+    path = project_export_dir(project_id) / f'{chip_id}.tif'
     if path.exists():
         return path
     return None
@@ -41,10 +76,117 @@ def get_chip_mask_path(project_id: int, chip_id: str) -> Path:
     Returns:
         Path to mask GeoTIFF file
     """
-    return Path(MASKS_DIR) / str(project_id) / f'{chip_id}.tif'
+    return project_mask_dir(project_id) / f'{chip_id}.tif'
+
+
+def _record_mask(chip_id: str, present: bool) -> None:
+    """Record mask existence in chip_assets so routes can skip the stat."""
+    from app.database import get_db, set_chip_asset
+
+    db = get_db()
+    set_chip_asset(db, chip_id, 'mask', present)
+    db.commit()
+
+
+def _predictor(dtype: str) -> int:
+    """
+    TIFF predictor for a sample type: horizontal differencing (2) for
+    integers, floating-point (3) for floats.
+    """
+    return 3 if np.issubdtype(np.dtype(dtype), np.floating) else 2
+
+
+@lru_cache(maxsize=1)
+def _zstd_supported() -> bool:
+    """
+    Check whether GDAL can write ZSTD GeoTIFFs.
 
+    Builds without ZSTD silently write uncompressed, so probe once with a
+    one-pixel dataset.
+    """
+    try:
+        with warnings.catch_warnings(), MemoryFile() as memfile:
+            warnings.simplefilter('ignore', rasterio.errors.NotGeoreferencedWarning)
+            with memfile.open(
+                driver='GTiff', width=1, height=1, count=1, dtype='uint8', compress='zstd'
+            ) as dst:
+                dst.write(np.zeros((1, 1, 1), dtype=np.uint8))
+            with memfile.open() as src:
+                return src.profile.get('compress') == 'zstd'
+    except rasterio.errors.RasterioError:
+        return False
+
+
+def _mask_compression(dtype: str) -> dict:
+    """
+    Creation options for compressing masks of the given dtype.
+
+    ZSTD decodes several times faster than LZW, falling back to fast
+    DEFLATE where GDAL lacks it. The predictor follows the dtype: for 0/1
+    masks horizontal differencing turns long runs of identical bytes into
+    zeros.
+    """
+    if _zstd_supported():
+        options = {'compress': 'zstd', 'zstd_level': 1}
+    else:
+        options = {'compress': 'deflate', 'zlevel': 1}
+    options['predictor'] = _predictor(dtype)
+    return options
+
+
+def _mask_buffer(height: int, width: int) -> np.ndarray:
+    """
+    Get a zeroed mask array, reused across masks on the same thread.
+
+    Chips share a handful of sizes, so regenerating a project's masks
+    mostly clears one array instead of allocating one per chip.
+    """
+    mask = getattr(_mask_buffers, 'mask', None)
+    if mask is None or mask.shape != (height, width):
+        mask = np.zeros((height, width), dtype=MASK_DTYPE)
+        _mask_buffers.mask = mask
+    else:
+        mask.fill(0)
+    return mask
+
+
+def _mask_profile(geotiff_path: Path) -> dict:
+    """
+    Get the profile for a chip's mask: the source GeoTIFF's, single band.
+
+    Every label save regenerates all of a project's masks, so profiles are
+    cached per source file and modification time instead of opening each
+    unchanged GeoTIFF again.
+    """
+    return dict(_mask_profile_cached(str(geotiff_path), geotiff_path.stat().st_mtime_ns))
+
+
+@lru_cache(maxsize=4096)
+def _mask_profile_cached(geotiff_path: str, mtime_ns: int) -> dict:
+    with rasterio.open(geotiff_path) as src:
+        profile = src.profile.copy()
 
-def generate_mask(project_id: int, chip_id: str, polygon_geometries: List[dict]) -> Optional[Path]:
+    # Create output profile matching source (but single band)
+    profile.update(
+        count=1,
+        dtype=MASK_DTYPE,
+        # Tiled so training can read windows
+        tiled=True,
+        blockxsize=256,
+        blockysize=256,
+        interleave='band',
+        **_mask_compression(MASK_DTYPE),
+    )
+    return profile
+
+
+def generate_mask(
+    project_id: int,
+    chip_id: str,
+    polygon_geometries: List[dict],
+    record: bool = True,
+    label_hash: Optional[str] = None
+) -> Optional[Path]:
     """
     Generate a binary mask GeoTIFF for a chip from polygon geometries.
 
@@ -55,6 +197,9 @@ def generate_mask(project_id: int, chip_id: str, polygon_geometries: List[dict])
         project_id: Project ID
         chip_id: Chip ID
         polygon_geometries: List of GeoJSON geometry dicts (in EPSG:4326)
+        record: Record the mask in chip_assets; batch callers pass False and
+            record all their masks in one transaction
+        label_hash: _label_hash of polygon_geometries, if already computed
 
     Returns:
         Path to generated mask, or None if source GeoTIFF doesn't exist
@@ -64,65 +209,186 @@ def generate_mask(project_id: int, chip_id: str, polygon_geometries: List[dict])
         return None
 
     # Ensure masks directory exists
-    mask_dir = Path(MASKS_DIR) / str(project_id)
+    mask_dir = project_mask_dir(project_id)
     mask_dir.mkdir(parents=True, exist_ok=True)
 
     mask_path = get_chip_mask_path(project_id, chip_id)
 
-    # Read source GeoTIFF to get transform, dimensions, and CRS
-    with rasterio.open(geotiff_path) as src:
-        transform = src.transform
-        width = src.width
-        height = src.height
-        crs = src.crs
-
-        # Convert GeoJSON to Shapely geometries with rasterize value
-        shapes = []
-        for geom in polygon_geometries:
-            try:
-                shapely_geom = shape(geom)
-                # Each shape tuple is (geometry, value)
-                shapes.append((shapely_geom, 1))
-            except Exception as e:
-                logger.warning(f"Skipping invalid geometry: {e}")
-                continue
-
-        # Generate binary mask using rasterize
-        if shapes:
-            mask = rasterize(
-                shapes=shapes,
-                out_shape=(height, width),
-                transform=transform,
-                fill=0,      # Background value
-                dtype=np.uint8,
-                all_touched=True  # Include all pixels touched by polygon
-            )
-        else:
-            # No valid polygons - create empty mask
-            mask = np.zeros((height, width), dtype=np.uint8)
-
-        # Create output profile matching source (but single band)
-        profile = src.profile.copy()
-        profile.update(
-            count=1,
-            dtype='uint8',
-            compress='lzw'  # Compress for smaller file size
+    # Mask profile matching the source GeoTIFF's transform, dimensions, and CRS
+    profile = _mask_profile(geotiff_path)
+    label_hash = label_hash or _label_hash(polygon_geometries)
+
+    # The same labels on the same chip grid (e.g. a project copied for
+    # testing) give the same mask, so link an identical earlier one
+    cache_path = mask_cache_dir() / f'{_mask_cache_key(profile, label_hash)}.tif'
+    tmp_path = mask_path.with_name(
+        f'{mask_path.name}.{os.getpid()}.{threading.get_ident()}.tmp'
+    )
+    if _link_cached_mask(cache_path, tmp_path):
+        os.replace(tmp_path, mask_path)
+        if record:
+            _record_mask(chip_id, True)
+        logger.info(f"Linked cached mask for chip {chip_id} at {mask_path}")
+        return mask_path
+
+    # Check all geometries in one GEOS call; entries that aren't valid
+    # GeoJSON come back missing and are skipped
+    parsed = shapely.from_geojson(
+        np.array([orjson.dumps(geom) for geom in polygon_geometries], dtype=object),
+        on_invalid='ignore',
+    )
+    valid = ~shapely.is_missing(parsed)
+    if not valid.all():
+        logger.warning(f"Skipping {int((~valid).sum())} invalid geometries for chip {chip_id}")
+
+    # Rasterize converts shapes through GeoJSON anyway, so pass the
+    # original dicts. Each shape tuple is (geometry, value).
+    shapes = [(geom, 1) for geom, ok in zip(polygon_geometries, valid) if ok]
+
+    # Start from an empty (background 0) mask; no valid polygons leaves it so
+    mask = _mask_buffer(profile['height'], profile['width'])
+
+    # Generate binary mask using rasterize
+    if shapes:
+        rasterize(
+            shapes=shapes,
+            out=mask,
+            transform=profile['transform'],
+            all_touched=True  # Include all pixels touched by polygon
         )
 
-        # Write mask GeoTIFF
-        with rasterio.open(mask_path, 'w', **profile) as dst:
+    # Encode the mask GeoTIFF in memory, so GDAL flushes tiles to a buffer
+    # and the file gets one sequential write
+    with MemoryFile() as memfile:
+        with memfile.open(**profile) as dst:
             dst.write(mask, 1)
+            # Lets regeneration skip masks whose labels haven't changed
+            dst.update_tags(**{LABEL_HASH_TAG: label_hash})
+        mask_bytes = memfile.read()
+
+    # Write to a unique temp file and rename so readers never see a partial mask
+    tmp_path.write_bytes(mask_bytes)
+    _cache_mask(tmp_path, cache_path)
+    os.replace(tmp_path, mask_path)
+
+    if record:
+        _record_mask(chip_id, True)
 
     logger.info(f"Generated mask for chip {chip_id} at {mask_path}")
     return mask_path
 
 
+def _label_hash(polygon_geometries: List[dict]) -> str:
+    """Hash a chip's polygons, independent of their order."""
+    digest = hashlib.blake2b(digest_size=16)
+    for encoded in sorted(
+        orjson.dumps(geom, option=orjson.OPT_SORT_KEYS) for geom in polygon_geometries
+    ):
+        digest.update(encoded)
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+
+def _mask_cache_key(profile: dict, label_hash: str) -> str:
+    """Key a mask by its full profile (grid, CRS, encoding) and labels."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr(sorted((key, str(value)) for key, value in profile.items())).encode())
+    digest.update(label_hash.encode())
+    return digest.hexdigest()
+
+
+def _link_cached_mask(cache_path: Path, mask_path: Path) -> bool:
+    """
+    Hardlink a cached mask to mask_path, copying across filesystems.
+
+    Returns False on a cache miss.
+    """
+    try:
+        try:
+            os.link(cache_path, mask_path)
+        except FileNotFoundError:
+            return False
+        except OSError:
+            shutil.copyfile(cache_path, mask_path)
+    except FileNotFoundError:
+        return False
+
+    # Links share one mtime; keep the mask newer than the export it is
+    # checked against
+    os.utime(mask_path)
+    return True
+
+
+def _cache_mask(mask_path: Path, cache_path: Path) -> None:
+    """Add a freshly written mask to the cache, if it isn't there already."""
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        os.link(mask_path, cache_path)
+    except FileExistsError:
+        pass
+    except OSError as e:
+        # Filesystems without hardlinks just go uncached
+        logger.debug(f"Could not cache mask {mask_path}: {e}")
+
+
+def prune_mask_cache() -> int:
+    """
+    Delete cached masks that no project mask links to any more.
+
+    Regenerating or removing a mask drops its link, leaving the cached
+    copy with a link count of one.
+
+    Returns:
+        Number of cached masks deleted
+    """
+    global _last_cache_prune
+    _last_cache_prune = time.monotonic()
+
+    removed = 0
+    for cache_path in mask_cache_dir().glob('*.tif'):
+        try:
+            if cache_path.stat().st_nlink == 1:
+                cache_path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def _mask_is_current(mask_path: Path, geotiff_path: Path, label_hash: str) -> bool:
+    """Check whether a mask was generated from these labels and this export."""
+    try:
+        if mask_path.stat().st_mtime_ns < geotiff_path.stat().st_mtime_ns:
+            return False
+        with rasterio.open(mask_path) as src:
+            return src.tags().get(LABEL_HASH_TAG) == label_hash
+    except (FileNotFoundError, rasterio.errors.RasterioIOError):
+        return False
+
+
+def _generate_mask_worker(args: Tuple[int, str, List[dict]]) -> Optional[str]:
+    """Generate one chip's mask unless it is current; returns the chip ID if it has one."""
+    project_id, chip_id, polygon_geometries = args
+    geotiff_path = get_chip_geotiff_path(project_id, chip_id)
+    if geotiff_path is None:
+        return None
+
+    label_hash = _label_hash(polygon_geometries)
+    if _mask_is_current(get_chip_mask_path(project_id, chip_id), geotiff_path, label_hash):
+        return chip_id
+
+    mask_path = generate_mask(
+        project_id, chip_id, polygon_geometries, record=False, label_hash=label_hash
+    )
+    return chip_id if mask_path else None
+
+
 def get_mask_png(project_id: int, chip_id: str) -> Optional[bytes]:
     """
     Get mask as PNG bytes for web display.
 
-    Converts the single-band GeoTIFF mask to a PNG image.
-    Values are scaled: 0 -> 0 (black), 1 -> 255 (white).
+    Converts the single-band GeoTIFF mask to a 1-bit grayscale PNG:
+    0 -> black, 1 -> white.
 
     Args:
         project_id: Project ID
@@ -138,16 +404,41 @@ def get_mask_png(project_id: int, chip_id: str) -> Optional[bytes]:
     with rasterio.open(mask_path) as src:
         mask = src.read(1)
 
-    # Scale 0->0, 1->255 for visibility in PNG
-    mask_image = (mask * 255).astype(np.uint8)
+    return _encode_bilevel_png(mask)
 
-    # Create PIL image and save to bytes
-    image = Image.fromarray(mask_image, mode='L')
-    buffer = io.BytesIO()
-    image.save(buffer, format='PNG')
-    buffer.seek(0)
 
-    return buffer.getvalue()
+def _png_chunk(chunk_type: bytes, data: bytes) -> bytes:
+    """Frame data as a PNG chunk: length, type, data and CRC."""
+    return (
+        struct.pack('>I', len(data))
+        + chunk_type
+        + data
+        + struct.pack('>I', zlib.crc32(data, zlib.crc32(chunk_type)))
+    )
+
+
+def _encode_bilevel_png(mask: np.ndarray) -> bytes:
+    """
+    Encode a mask as a 1-bit grayscale PNG, nonzero pixels white.
+
+    Packing eight pixels per byte gives zlib an eighth of the data an 8-bit
+    image would. PNG pads each row to a whole byte, as packbits does.
+    """
+    height, width = mask.shape
+
+    # Each scanline is a filter byte (0, none) followed by the packed row
+    scanlines = np.zeros((height, (width + 7) // 8 + 1), dtype=np.uint8)
+    scanlines[:, 1:] = np.packbits(mask != 0, axis=1)
+
+    # Width, height, bit depth 1, grayscale, deflate, adaptive filter,
+    # no interlace
+    header = struct.pack('>IIBBBBB', width, height, 1, 0, 0, 0, 0)
+    return (
+        PNG_SIGNATURE
+        + _png_chunk(b'IHDR', header)
+        + _png_chunk(b'IDAT', zlib.compress(scanlines.tobytes(), MASK_PNG_COMPRESS_LEVEL))
+        + _png_chunk(b'IEND', b'')
+    )
 
 
 def delete_mask(project_id: int, chip_id: str) -> bool:
@@ -164,6 +455,7 @@ def delete_mask(project_id: int, chip_id: str) -> bool:
     mask_path = get_chip_mask_path(project_id, chip_id)
     if mask_path.exists():
         mask_path.unlink()
+        _record_mask(chip_id, False)
         return True
     return False
 
@@ -205,7 +497,7 @@ def regenerate_mask_for_chip(project_id: int, chip_id: str) -> Optional[Path]:
     ).fetchall()
 
     polygon_geometries = [
-        json.loads(row['geometry_geojson'])
+        orjson.loads(row['geometry_geojson'])
         for row in polygon_rows
     ]
 
@@ -217,46 +509,65 @@ def regenerate_all_masks_for_project(project_id: int) -> int:
     Regenerate all masks for a project.
 
     Call this after labels are saved to ensure masks are up-to-date.
-    Only regenerates masks for positive chips that have exported imagery.
+    Only regenerates masks for positive chips that have exported imagery,
+    keeping masks already generated from the same polygons and export.
 
     Args:
         project_id: Project ID
 
     Returns:
-        Number of masks generated
+        Number of positive chips with an up-to-date mask
     """
-    from app.database import get_db
+    from app.database import get_db, set_chip_asset, transaction
 
     db = get_db()
 
-    # Get all positive chips
-    chip_rows = db.execute(
-        '''SELECT id FROM chips
-           WHERE project_id = ? AND chip_type = 'positive' ''',
+    # Get all positive chips with their polygons in one query; chips
+    # without polygons come back once with a NULL geometry
+    rows = db.execute(
+        '''SELECT c.id AS chip_id, p.geometry_geojson
+           FROM chips c
+           LEFT JOIN polygons p ON p.chip_id = c.id
+           WHERE c.project_id = ? AND c.chip_type = 'positive'
+           ORDER BY c.id''',
         (project_id,)
     ).fetchall()
 
-    count = 0
-    for chip_row in chip_rows:
-        chip_id = chip_row['id']
-
+    tasks = []
+    for chip_id, chip_rows in groupby(rows, key=itemgetter('chip_id')):
         # Only regenerate if GeoTIFF exists
         if get_chip_geotiff_path(project_id, chip_id) is None:
             continue
 
-        # Get polygons for this chip
-        polygon_rows = db.execute(
-            'SELECT geometry_geojson FROM polygons WHERE chip_id = ?',
-            (chip_id,)
-        ).fetchall()
-
         polygon_geometries = [
-            json.loads(row['geometry_geojson'])
-            for row in polygon_rows
+            orjson.loads(row['geometry_geojson'])
+            for row in chip_rows
+            if row['geometry_geojson'] is not None
         ]
+        tasks.append((project_id, chip_id, polygon_geometries))
+
+    # Rasterizing, compressing and writing each mask is independent work
+    # that runs in GDAL without the GIL, so spread larger projects across
+    # threads. Geometries were parsed above, leaving little Python per chip.
+    if len(tasks) < MASK_POOL_MIN_CHIPS or MASK_WORKERS <= 1:
+        generated = [chip_id for chip_id in map(_generate_mask_worker, tasks) if chip_id]
+    else:
+        with ThreadPoolExecutor(max_workers=MASK_WORKERS) as executor:
+            results = executor.map(_generate_mask_worker, tasks)
+            generated = [chip_id for chip_id in results if chip_id]
+
+    # Record every mask in one commit rather than one per chip
+    if generated:
+        now = datetime.utcnow().isoformat() + 'Z'
+        with transaction(db):
+            for chip_id in generated:
+                set_chip_asset(db, chip_id, 'mask', True, updated_at=now)
+
+    count = len(generated)
+    logger.info(f"Regenerated {count} masks for project {project_id}")
 
-        if generate_mask(project_id, chip_id, polygon_geometries):
-            count += 1
+    # Regeneration is what unlinks cached masks, so prune from here
+    if time.monotonic() - _last_cache_prune >= MASK_CACHE_PRUNE_INTERVAL:
+        prune_mask_cache()
 
-    logger.info(f"Regenerated {count} masks for project {project_id}")
     return count
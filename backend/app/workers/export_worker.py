@@ -2,13 +2,17 @@
 Background worker for downloading GEE imagery for chips.
 Uses fixed parameters: 2025-01-01 to 2025-12-31, 30% cloud cover.
 """
-import json
 import logging
+import os
 import threading
 import queue
+from datetime import datetime
 from pathlib import Path
 
-from app.config import EXPORTS_DIR
+import orjson
+
+from app.config import GEE_DOWNLOAD_WORKERS, WORKER_POLL_INTERVAL, project_export_dir
+from app.database import get_db, get_worker_db, set_chip_asset
 from app.services.gee_service import get_gee_service, DEFAULT_BANDS
 from app.services.mask_service import generate_mask
 
@@ -22,14 +26,33 @@ CLOUD_COVER_MAX = 30
 # Download queue: (project_id, chip_id, geometry)
 _download_queue = queue.Queue()
 
-# Track download status: {chip_id: 'pending' | 'downloading' | 'completed' | 'failed'}
+# Mask generation queue: (project_id, chip_id). Bounded so downloads that
+# outpace rasterizing wait for a slot instead of piling up in memory.
+MASK_QUEUE_SIZE = 256
+_mask_queue = queue.Queue(maxsize=MASK_QUEUE_SIZE)
+
+# Threads generating masks for downloaded chips; rasterizing and compressing
+# run in GDAL without the GIL
+MASK_THREADS = 2
+
+# Queued by stop() to end the worker loops
+_STOP = object()
+
+# Track download status: {chip_id: 'pending' | 'downloading' | 'completed' | 'failed'}.
+# Single-key reads and writes are atomic under the GIL; _status_lock guards
+# check-then-set sequences and whole-map snapshots.
 _download_status = {}
 _status_lock = threading.Lock()
 
+# projects.updated_at as of each project's last queue_chip_downloads.
+# Saving labels touches the project, so a newer value seen by the worker's
+# poller means labels were saved, possibly by another server process.
+_queued_versions = {}
+
 
 def get_chip_file_path(project_id: int, chip_id: str) -> Path:
     """Get the path where a chip's GeoTIFF would be stored."""
-    return Path(EXPORTS_DIR) / str(project_id) / f'{chip_id}.tif'
+    return project_export_dir(project_id) / f'{chip_id}.tif'
 
 
 def is_chip_downloaded(project_id: int, chip_id: str) -> bool:
@@ -39,51 +62,53 @@ def is_chip_downloaded(project_id: int, chip_id: str) -> bool:
 
 def get_download_status(chip_id: str) -> str:
     """Get the download status of a chip."""
-    with _status_lock:
-        return _download_status.get(chip_id, 'unknown')
+    return _download_status.get(chip_id, 'unknown')
 
 
-def get_project_download_status(project_id: int, chip_ids: list) -> dict:
+def get_download_statuses() -> dict:
     """
-    Get download status for all chips in a project.
+    Snapshot the in-memory download status of every queued chip.
 
-    Returns dict mapping chip_id to status:
-    - 'completed': File exists
-    - 'downloading': Currently being downloaded
-    - 'pending': In queue
-    - 'failed': Download failed
+    Completed downloads are tracked in the chip_assets table, so callers
+    join that in SQL and only consult this map for chips without an export.
     """
-    status = {}
     with _status_lock:
-        for chip_id in chip_ids:
-            if is_chip_downloaded(project_id, chip_id):
-                status[chip_id] = 'completed'
-            elif chip_id in _download_status:
-                status[chip_id] = _download_status[chip_id]
-            else:
-                status[chip_id] = 'pending'
-    return status
+        return dict(_download_status)
 
 
 def queue_chip_downloads(project_id: int):
     """
     Queue downloads for all chips in a project that don't have imagery yet.
     Called after labels are saved.
+
+    Does nothing in a server process without the export worker; the worker's
+    process queues the chips once it sees the project was updated.
     """
-    from app.database import get_db
+    if _worker_instance is None:
+        return
 
     db = get_db()
+    version = db.execute(
+        'SELECT updated_at FROM projects WHERE id = ?', (project_id,)
+    ).fetchone()
+    if version is not None:
+        _queued_versions[project_id] = version['updated_at']
+
     cursor = db.execute(
         'SELECT id, geometry_geojson FROM chips WHERE project_id = ?',
         (project_id,)
     )
 
+    now = datetime.utcnow().isoformat() + 'Z'
     chips_queued = 0
+    downloaded = False
     for row in cursor.fetchall():
         chip_id = row['id']
 
-        # Skip if already downloaded
+        # Skip if already downloaded, making sure chip_assets knows about it
         if is_chip_downloaded(project_id, chip_id):
+            set_chip_asset(db, chip_id, 'export', updated_at=now)
+            downloaded = True
             continue
 
         # Skip if already in queue or being processed
@@ -92,60 +117,123 @@ def queue_chip_downloads(project_id: int):
                 continue
             _download_status[chip_id] = 'pending'
 
-        geometry = json.loads(row['geometry_geojson'])
+        geometry = orjson.loads(row['geometry_geojson'])
         _download_queue.put((project_id, chip_id, geometry))
         chips_queued += 1
 
+    if downloaded:
+        db.commit()
+
     if chips_queued > 0:
         logger.info(f"Queued {chips_queued} chips for download in project {project_id}")
 
 
+def _project_versions() -> dict:
+    """Map each project's ID to its updated_at."""
+    rows = get_worker_db().execute('SELECT id, updated_at FROM projects')
+    return {row['id']: row['updated_at'] for row in rows}
+
+
 class ExportWorker:
-    """Background worker that downloads GEE imagery for chips."""
+    """
+    Background worker that downloads GEE imagery for chips.
+
+    Downloads spend nearly all their time waiting on Earth Engine, so
+    several threads take chips from the queue to keep that many in flight.
+    Masks for downloaded chips are generated on separate threads so a
+    download slot is free again as soon as its file lands. A poller thread
+    queues the chips of projects whose labels were saved by other server
+    processes.
+    """
 
     def __init__(self, app):
         self.app = app
         self.gee_service = None
-        self._stop_event = threading.Event()
-        self._thread = None
+        self._threads = []
+        self._mask_threads = []
+        self._poller = None
+        self._stop_polling = threading.Event()
+        self._gee_lock = threading.Lock()
+        self._gee_attempted = False
 
     def start(self):
-        """Start the background worker thread."""
-        if self._thread is not None:
+        """Start the background worker threads."""
+        if self._threads:
             return
 
-        self._stop_event.clear()
-        self._thread = threading.Thread(target=self._run, daemon=True)
-        self._thread.start()
-        logger.info("Export worker started")
+        # Daemon threads, like the other workers, so exiting never waits
+        # on a download in flight
+        self._threads = [
+            threading.Thread(target=self._run, name=f'export-{i}', daemon=True)
+            for i in range(GEE_DOWNLOAD_WORKERS)
+        ]
+        self._mask_threads = [
+            threading.Thread(target=self._run_masks, name=f'export-mask-{i}', daemon=True)
+            for i in range(MASK_THREADS)
+        ]
+        # Labels saved before the worker started are not queued, as before
+        _queued_versions.clear()
+        _queued_versions.update(_project_versions())
+        self._stop_polling.clear()
+        self._poller = threading.Thread(
+            target=self._poll_projects, name='export-poller', daemon=True
+        )
+
+        for thread in self._threads + self._mask_threads + [self._poller]:
+            thread.start()
+        logger.info(f"Export worker started with {len(self._threads)} threads")
 
     def stop(self):
         """Stop the background worker."""
-        if self._thread is None:
+        if not self._threads:
             return
 
-        self._stop_event.set()
-        self._thread.join(timeout=30)
-        self._thread = None
+        self._stop_polling.set()
+        self._poller.join(timeout=30)
+        self._poller = None
+
+        # Each thread exits at one _STOP, once the chips queued ahead of the
+        # stops are done
+        for _ in self._threads:
+            _download_queue.put(_STOP)
+        for thread in self._threads:
+            thread.join(timeout=30)
+        self._threads = []
+
+        # Then the mask threads, after the masks the downloads queued
+        for _ in self._mask_threads:
+            _mask_queue.put(_STOP)
+        for thread in self._mask_threads:
+            thread.join(timeout=30)
+        self._mask_threads = []
         logger.info("Export worker stopped")
 
+    def _init_gee(self):
+        """Initialize the GEE service once, from the first thread to run."""
+        with self._gee_lock:
+            if self._gee_attempted:
+                return
+            self._gee_attempted = True
+            try:
+                self.gee_service = get_gee_service()
+                logger.info("GEE service initialized in worker")
+            except Exception as e:
+                logger.error(f"Failed to initialize GEE service: {e}")
+                logger.warning("Export worker running without GEE - downloads will fail")
+
     def _run(self):
         """Main worker loop."""
         # Initialize GEE service in worker thread
-        try:
-            self.gee_service = get_gee_service()
-            logger.info("GEE service initialized in worker")
-        except Exception as e:
-            logger.error(f"Failed to initialize GEE service: {e}")
-            logger.warning("Export worker running without GEE - downloads will fail")
+        self._init_gee()
+
+        while True:
+            # Block until there is work; stop() queues _STOP to end the loop
+            item = _download_queue.get()
+            if item is _STOP:
+                return
 
-        while not self._stop_event.is_set():
             try:
-                # Wait for items in queue with timeout
-                try:
-                    project_id, chip_id, geometry = _download_queue.get(timeout=5)
-                except queue.Empty:
-                    continue
+                project_id, chip_id, geometry = item
 
                 # Process the download
                 with self.app.app_context():
@@ -154,17 +242,47 @@ class ExportWorker:
             except Exception as e:
                 logger.exception(f"Error in export worker: {e}")
 
+    def _poll_projects(self):
+        """Queue the chips of projects updated since they were last queued."""
+        while not self._stop_polling.wait(WORKER_POLL_INTERVAL):
+            try:
+                versions = _project_versions()
+                queued = _queued_versions.copy()
+                for project_id, version in versions.items():
+                    if queued.get(project_id) != version:
+                        with self.app.app_context():
+                            queue_chip_downloads(project_id)
+
+                # Forget deleted projects
+                for project_id in queued.keys() - versions.keys():
+                    _queued_versions.pop(project_id, None)
+
+            except Exception as e:
+                logger.exception(f"Error polling for saved labels: {e}")
+
+    def _run_masks(self):
+        """Mask generation loop."""
+        while True:
+            item = _mask_queue.get()
+            if item is _STOP:
+                return
+
+            project_id, chip_id = item
+            with self.app.app_context():
+                self._generate_chip_mask(project_id, chip_id)
+
     def _download_chip(self, project_id: int, chip_id: str, geometry: dict):
         """Download a single chip."""
         # Check if already downloaded (could have been downloaded while in queue)
         if is_chip_downloaded(project_id, chip_id):
-            with _status_lock:
-                _download_status[chip_id] = 'completed'
+            _download_status[chip_id] = 'completed'
+            db = get_worker_db()
+            set_chip_asset(db, chip_id, 'export')
+            db.commit()
             return
 
         # Mark as downloading
-        with _status_lock:
-            _download_status[chip_id] = 'downloading'
+        _download_status[chip_id] = 'downloading'
 
         try:
             if self.gee_service is None:
@@ -182,25 +300,26 @@ class ExportWorker:
                 cloud_cover_max=CLOUD_COVER_MAX
             )
 
-            with _status_lock:
-                _download_status[chip_id] = 'completed'
+            _download_status[chip_id] = 'completed'
 
             logger.info(f"Chip {chip_id} downloaded to {local_path}")
 
-            # Generate mask for positive chips
-            self._generate_chip_mask(project_id, chip_id)
+            db = get_worker_db()
+            set_chip_asset(db, chip_id, 'export')
+            db.commit()
+
+            # Generate mask for positive chips on the mask threads; blocks
+            # only while the mask queue is full
+            _mask_queue.put((project_id, chip_id))
 
         except Exception as e:
             logger.error(f"Failed to download chip {chip_id}: {e}")
-            with _status_lock:
-                _download_status[chip_id] = 'failed'
+            _download_status[chip_id] = 'failed'
 
     def _generate_chip_mask(self, project_id: int, chip_id: str):
         """Generate mask for a positive chip after imagery is downloaded."""
-        from app.database import get_db
-
         try:
-            db = get_db()
+            db = get_worker_db()
 
             # Check if chip is positive
             chip_row = db.execute(
@@ -221,7 +340,7 @@ class ExportWorker:
                 return  # No polygons to rasterize
 
             polygon_geometries = [
-                json.loads(row['geometry_geojson'])
+                orjson.loads(row['geometry_geojson'])
                 for row in polygon_rows
             ]
 
@@ -238,6 +357,22 @@ class ExportWorker:
 _worker_instance = None
 
 
+def _reset_after_fork():
+    """Forget the parent's worker, queues and locks in a forked server process."""
+    global _worker_instance, _download_queue, _mask_queue, _download_status
+    global _status_lock, _queued_versions
+
+    _worker_instance = None
+    _download_queue = queue.Queue()
+    _mask_queue = queue.Queue(maxsize=MASK_QUEUE_SIZE)
+    _download_status = {}
+    _status_lock = threading.Lock()
+    _queued_versions = {}
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
 def start_export_worker(app):
     """Start the export worker with the Flask app context."""
     global _worker_instance
@@ -4,17 +4,26 @@ Runs inference in a separate thread and updates job status in database.
 """
 import json
 import logging
+import os
 import threading
 import queue
 from datetime import datetime
 
-from app.config import INFERENCE_DIR
+import orjson
+
+from app.config import INFERENCE_DIR, WORKER_POLL_INTERVAL
+from app.services.job_cache import invalidate_inference
 
 logger = logging.getLogger(__name__)
 
-# Inference queue: (job_id, project_id, bounds, checkpoint_path)
+# Wakes the worker for jobs created in this process: job_id. The jobs
+# themselves are read from the inference_jobs table, which also holds the
+# jobs created by other server processes.
 _inference_queue = queue.Queue()
 
+# Queued by stop() to end the worker loop
+_STOP = object()
+
 # Currently running job ID (only one at a time per project)
 _current_job_id = None
 _job_lock = threading.Lock()
@@ -26,9 +35,13 @@ def get_current_inference_job() -> int | None:
         return _current_job_id
 
 
-def queue_inference_job(job_id: int, project_id: int, bounds: dict, checkpoint_path: str):
-    """Add an inference job to the queue."""
-    _inference_queue.put((job_id, project_id, bounds, checkpoint_path))
+def queue_inference_job(job_id: int, project_id: int):
+    """Wake the inference worker for a job just saved as pending."""
+    if _worker_instance is None:
+        # The process running the worker finds the job on its next poll
+        logger.info(f"Inference job {job_id} for project {project_id} left for the worker process")
+        return
+    _inference_queue.put(job_id)
     logger.info(f"Queued inference job {job_id} for project {project_id}")
 
 
@@ -63,7 +76,6 @@ class InferenceWorker:
 
     def __init__(self, app):
         self.app = app
-        self._stop_event = threading.Event()
         self._thread = None
 
     def start(self):
@@ -71,7 +83,6 @@ class InferenceWorker:
         if self._thread is not None:
             return
 
-        self._stop_event.clear()
         self._thread = threading.Thread(target=self._run, daemon=True)
         self._thread.start()
         logger.info("Inference worker started")
@@ -81,37 +92,67 @@ class InferenceWorker:
         if self._thread is None:
             return
 
-        self._stop_event.set()
+        # Wakes the worker once the jobs queued ahead of it are done
+        _inference_queue.put(_STOP)
         self._thread.join(timeout=60)
         self._thread = None
         logger.info("Inference worker stopped")
 
     def _run(self):
         """Main worker loop."""
-        global _current_job_id
-
-        while not self._stop_event.is_set():
+        while True:
+            # Jobs queued in this process wake the loop at once; jobs created
+            # by other server processes are found by polling. stop() queues
+            # _STOP to end the loop.
             try:
-                # Wait for items in queue with timeout
-                try:
-                    job_id, project_id, bounds, checkpoint_path = _inference_queue.get(timeout=5)
-                except queue.Empty:
-                    continue
-
-                # Process the inference job
-                with self.app.app_context():
-                    self._run_inference_job(job_id, project_id, bounds, checkpoint_path)
+                if _inference_queue.get(timeout=WORKER_POLL_INTERVAL) is _STOP:
+                    return
+            except queue.Empty:
+                pass
 
+            try:
+                pending = self._pending_jobs()
             except Exception as e:
                 logger.exception(f"Error in inference worker: {e}")
+                continue
+
+            for job_id, project_id, bounds, checkpoint_path in pending:
+                try:
+                    # Process the inference job
+                    with self.app.app_context():
+                        self._run_inference_job(job_id, project_id, bounds, checkpoint_path)
+
+                except Exception as e:
+                    logger.exception(f"Error in inference worker: {e}")
+
+    def _pending_jobs(self) -> list[tuple[int, int, dict, str]]:
+        """
+        List pending inference jobs, oldest first.
+
+        Returns (job_id, project_id, bounds, checkpoint_path) tuples, with
+        the checkpoint of the training job each was started from.
+        """
+        from app.database import get_worker_db
+
+        rows = get_worker_db().execute(
+            '''SELECT i.id, i.project_id, i.bounds_geojson, t.checkpoint_path
+               FROM inference_jobs i
+               JOIN training_jobs t ON t.id = i.training_job_id
+               WHERE i.status = 'pending'
+               ORDER BY i.id'''
+        ).fetchall()
+        return [
+            (row['id'], row['project_id'], orjson.loads(row['bounds_geojson']), row['checkpoint_path'])
+            for row in rows
+        ]
 
     def _run_inference_job(self, job_id: int, project_id: int, bounds: dict, checkpoint_path: str):
         """Run a single inference job."""
         global _current_job_id
-        from app.database import get_db
+        from app.database import get_worker_db
         from app.services.inference_service import run_inference
 
-        db = get_db()
+        db = get_worker_db()
 
         # Check if job was cancelled while in queue
         job = db.execute(
@@ -141,18 +182,18 @@ class InferenceWorker:
             def progress_callback(progress: float, message: str):
                 """Update job progress in database."""
                 try:
-                    with self.app.app_context():
-                        db = get_db()
-                        # Update status based on progress
-                        status = 'downloading' if progress < 50 else 'inferring'
-                        db.execute(
-                            '''UPDATE inference_jobs
-                               SET status = ?, progress = ?, progress_message = ?
-                               WHERE id = ?''',
-                            (status, progress, message, job_id)
-                        )
-                        db.commit()
-                        logger.info(f"Job {job_id}: {progress:.1f}% - {message}")
+                    # Runs on this thread, so it reuses the job's connection.
+                    # run_inference already throttles per-batch updates.
+                    # Update status based on progress
+                    status = 'downloading' if progress < 50 else 'inferring'
+                    db.execute(
+                        '''UPDATE inference_jobs
+                           SET status = ?, progress = ?, progress_message = ?
+                           WHERE id = ?''',
+                        (status, progress, message, job_id)
+                    )
+                    db.commit()
+                    logger.info(f"Job {job_id}: {progress:.1f}% - {message}")
                 except Exception as e:
                     logger.warning(f"Failed to update progress: {e}")
 
@@ -178,6 +219,7 @@ class InferenceWorker:
                 (now, result['overlay_png'], job_id)
             )
             db.commit()
+            invalidate_inference(project_id)
 
             logger.info(f"Inference job {job_id} completed. Output: {result['overlay_png']}")
 
@@ -205,6 +247,19 @@ class InferenceWorker:
 _worker_instance = None
 
 
+def _reset_after_fork():
+    """Forget the parent's worker and locks in a forked server process."""
+    global _worker_instance, _inference_queue, _current_job_id, _job_lock
+
+    _worker_instance = None
+    _inference_queue = queue.Queue()
+    _current_job_id = None
+    _job_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
 def start_inference_worker(app):
     """Start the inference worker with the Flask app context."""
     global _worker_instance
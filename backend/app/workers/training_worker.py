@@ -4,18 +4,24 @@ Runs training in a separate thread and updates job status in database.
 """
 import json
 import logging
+import os
 import threading
 import queue
 from datetime import datetime
 
-from app.config import MODELS_DIR
-from app.ml.trainer import run_training, TRAINING_CONFIG
+from app.config import MODELS_DIR, WORKER_POLL_INTERVAL
+from app.services.job_cache import invalidate_training
 
 logger = logging.getLogger(__name__)
 
-# Training queue: (job_id, project_id)
+# Wakes the worker for jobs created in this process: job_id. The jobs
+# themselves are read from the training_jobs table, which also holds the
+# jobs created by other server processes.
 _training_queue = queue.Queue()
 
+# Queued by stop() to end the worker loop
+_STOP = object()
+
 # Currently running job ID (only one at a time)
 _current_job_id = None
 _job_lock = threading.Lock()
@@ -28,8 +34,12 @@ def get_current_training_job() -> int | None:
 
 
 def queue_training_job(job_id: int, project_id: int):
-    """Add a training job to the queue."""
-    _training_queue.put((job_id, project_id))
+    """Wake the training worker for a job just saved as pending."""
+    if _worker_instance is None:
+        # The process running the worker finds the job on its next poll
+        logger.info(f"Training job {job_id} for project {project_id} left for the worker process")
+        return
+    _training_queue.put(job_id)
     logger.info(f"Queued training job {job_id} for project {project_id}")
 
 
@@ -66,7 +76,6 @@ class TrainingWorker:
 
     def __init__(self, app):
         self.app = app
-        self._stop_event = threading.Event()
         self._thread = None
 
     def start(self):
@@ -74,7 +83,6 @@ class TrainingWorker:
         if self._thread is not None:
             return
 
-        self._stop_event.clear()
         self._thread = threading.Thread(target=self._run, daemon=True)
         self._thread.start()
         logger.info("Training worker started")
@@ -84,36 +92,54 @@ class TrainingWorker:
         if self._thread is None:
             return
 
-        self._stop_event.set()
+        # Wakes the worker once the jobs queued ahead of it are done
+        _training_queue.put(_STOP)
         self._thread.join(timeout=60)  # Give more time for training to stop
         self._thread = None
         logger.info("Training worker stopped")
 
     def _run(self):
         """Main worker loop."""
-        global _current_job_id
+        while True:
+            # Jobs queued in this process wake the loop at once; jobs created
+            # by other server processes are found by polling. stop() queues
+            # _STOP to end the loop.
+            try:
+                if _training_queue.get(timeout=WORKER_POLL_INTERVAL) is _STOP:
+                    return
+            except queue.Empty:
+                pass
 
-        while not self._stop_event.is_set():
             try:
-                # Wait for items in queue with timeout
+                pending = self._pending_jobs()
+            except Exception as e:
+                logger.exception(f"Error in training worker: {e}")
+                continue
+
+            for job_id, project_id in pending:
                 try:
-                    job_id, project_id = _training_queue.get(timeout=5)
-                except queue.Empty:
-                    continue
+                    # Process the training job
+                    with self.app.app_context():
+                        self._run_training_job(job_id, project_id)
 
-                # Process the training job
-                with self.app.app_context():
-                    self._run_training_job(job_id, project_id)
+                except Exception as e:
+                    logger.exception(f"Error in training worker: {e}")
 
-            except Exception as e:
-                logger.exception(f"Error in training worker: {e}")
+    def _pending_jobs(self) -> list[tuple[int, int]]:
+        """List (job_id, project_id) of pending training jobs, oldest first."""
+        from app.database import get_worker_db
+
+        rows = get_worker_db().execute(
+            "SELECT id, project_id FROM training_jobs WHERE status = 'pending' ORDER BY id"
+        ).fetchall()
+        return [(row['id'], row['project_id']) for row in rows]
 
     def _run_training_job(self, job_id: int, project_id: int):
         """Run a single training job."""
         global _current_job_id
-        from app.database import get_db
+        from app.database import get_worker_db
 
-        db = get_db()
+        db = get_worker_db()
 
         # Check if job was cancelled while in queue
         job = db.execute(
@@ -137,30 +163,34 @@ class TrainingWorker:
             (now, job_id)
         )
         db.commit()
+        invalidate_training(project_id)
 
         logger.info(f"Starting training job {job_id} for project {project_id}")
 
         try:
+            # Imported here so a broken ML stack fails this job instead of
+            # leaving it pending
+            from app.ml.trainer import run_training
+
             def progress_callback(epoch, total_epochs, train_loss, val_loss, val_iou):
                 """Update job progress in database."""
                 try:
-                    with self.app.app_context():
-                        db = get_db()
-                        db.execute(
-                            '''UPDATE training_jobs
-                               SET current_epoch = ?,
-                                   total_epochs = ?,
-                                   train_loss = ?,
-                                   val_loss = ?,
-                                   val_iou = ?
-                               WHERE id = ?''',
-                            (epoch, total_epochs, train_loss, val_loss, val_iou, job_id)
-                        )
-                        db.commit()
-                        logger.info(
-                            f"Job {job_id} epoch {epoch}/{total_epochs}: "
-                            f"train_loss={train_loss:.4f}, val_loss={val_loss:.4f}, val_iou={val_iou:.4f}"
-                        )
+                    db.execute(
+                        '''UPDATE training_jobs
+                           SET current_epoch = ?,
+                               total_epochs = ?,
+                               train_loss = ?,
+                               val_loss = ?,
+                               val_iou = ?
+                           WHERE id = ?''',
+                        (epoch, total_epochs, train_loss, val_loss, val_iou, job_id)
+                    )
+                    db.commit()
+                    invalidate_training(project_id)
+                    logger.info(
+                        f"Job {job_id} epoch {epoch}/{total_epochs}: "
+                        f"train_loss={train_loss:.4f}, val_loss={val_loss:.4f}, val_iou={val_iou:.4f}"
+                    )
                 except Exception as e:
                     logger.warning(f"Failed to update progress: {e}")
 
@@ -182,6 +212,7 @@ class TrainingWorker:
                 (now, checkpoint_path, job_id)
             )
             db.commit()
+            invalidate_training(project_id)
 
             logger.info(f"Training job {job_id} completed. Checkpoint: {checkpoint_path}")
 
@@ -199,6 +230,7 @@ class TrainingWorker:
                 (now, str(e), job_id)
             )
             db.commit()
+            invalidate_training(project_id)
 
         finally:
             with _job_lock:
@@ -209,6 +241,19 @@ class TrainingWorker:
 _worker_instance = None
 
 
+def _reset_after_fork():
+    """Forget the parent's worker and locks in a forked server process."""
+    global _worker_instance, _training_queue, _current_job_id, _job_lock
+
+    _worker_instance = None
+    _training_queue = queue.Queue()
+    _current_job_id = None
+    _job_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
 def start_training_worker(app):
     """Start the training worker with the Flask app context."""
     global _worker_instance
@@ -1,5 +1,10 @@
 #!/usr/bin/env python3
 """Development server entry point."""
+import os
+
+if __name__ == '__main__':
+    # Enable debug before create_app() so the reloader parent skips the workers
+    os.environ.setdefault('FLASK_DEBUG', '1')
 
 from app import create_app
 
@@ -0,0 +1,54 @@
+"""Tests for the cached spatial index of the TorchGeo datasets."""
+
+import numpy as np
+import pytest
+
+pytest.importorskip('torchgeo')
+
+import rasterio
+from rasterio.transform import from_origin
+
+from app.ml.dataset import GeoLabelImageDataset, GeoLabelMaskDataset
+
+
+def _write_chips(directory, count, bands):
+    """Write count adjacent 32x32 chips with the given band count."""
+    for i in range(count):
+        with rasterio.open(
+            directory / f'chip-{i}.tif',
+            'w',
+            driver='GTiff',
+            width=32,
+            height=32,
+            count=bands,
+            dtype='uint16',
+            crs='EPSG:32633',
+            transform=from_origin(500000 + i * 320, 4000000, 10, 10),
+        ) as dst:
+            dst.write(np.full((bands, 32, 32), i + 1, dtype=np.uint16))
+
+
+@pytest.mark.parametrize(
+    ('dataset_cls', 'bands'),
+    [(GeoLabelImageDataset, 10), (GeoLabelMaskDataset, 1)],
+)
+def test_warm_start_matches_cold_start(tmp_path, dataset_cls, bands):
+    _write_chips(tmp_path, 3, bands)
+
+    cold = dataset_cls(str(tmp_path))
+    assert (tmp_path / dataset_cls.index_cache_name).exists()
+    warm = dataset_cls(str(tmp_path))
+
+    assert warm.__dict__.keys() == cold.__dict__.keys()
+    assert warm.crs == cold.crs
+    assert warm.res == cold.res
+    assert warm.bounds == cold.bounds
+    assert len(warm) == len(cold)
+
+
+def test_new_file_invalidates_cache(tmp_path):
+    _write_chips(tmp_path, 2, 1)
+    assert len(GeoLabelMaskDataset(str(tmp_path))) == 2
+
+    _write_chips(tmp_path, 3, 1)
+    assert len(GeoLabelMaskDataset(str(tmp_path))) == 3